@@ -15,8 +15,12 @@ from components.multi_workout_main import (
     start_plank_workout,
     start_pullup_workout
 )
+from backend.pose_detection.detector_pool import warm_up_in_background
 st.set_page_config(page_title="Aithletique", layout="centered")
 
+# Build the MediaPipe graphs in the background while the user picks an activity
+warm_up_in_background(face_mesh=True)
+
 st.markdown("""
 <style>
 section[data-testid="stSidebar"] > div:first-child {
@@ -96,6 +100,8 @@ with tabs[0]:
     npz_files = [f for f in os.listdir(pose_folder) if f.endswith(".npz")]
     yoga_poses = [os.path.splitext(f)[0].replace("_", " ").title() for f in npz_files]
     yoga_poses.append("Meditation")
+    # Recognizes the asana from every reference in pose_references
+    yoga_poses.append("Auto Detect")
 
     pose_type = st.selectbox("🎯 Choose Your Activity:", sorted(yoga_poses), key="yoga_select")
     st.markdown(f"📝 Live feedback for: *{pose_type}*")
@@ -162,15 +168,18 @@ with tabs[1]:
         st.video(video_to_play, start_time=0)
         st.caption("Showing preview clip. Full session starts when you click the button.")
 
+    group_class = pose_type != "Squat" and st.checkbox("👥 Group class (track everyone in view)", key="group_class")
+    max_people = 4 if group_class else 1
+
     if st.button("🎥 Start Workout Session"):
         if pose_type.lower() == "squat":
             start_squat_workout()
         elif pose_type.lower() == "pushup":
-            start_pushup_workout()
+            start_pushup_workout(max_people=max_people)
         elif pose_type.lower() == "plank":
-            start_plank_workout()
+            start_plank_workout(max_people=max_people)
         elif pose_type.lower() == "pull-up":
-            start_pullup_workout()
+            start_pullup_workout(max_people=max_people)
         else:
             run_pose_detection(pose_name=pose_type.lower(), category="Workout & Training")
 
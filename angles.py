@@ -2,31 +2,82 @@
 
 import numpy as np
 
+
+def joint_angles(landmarks, triplets, dims=2, directed=False, scale=None, min_visibility=None):
+    """
+    The joint-angle kernel every angle in the app goes through.
+
+    landmarks: (..., N, D) array, e.g. (33, 4) for one pose, (frames, 33, 4)
+               for a clip or (persons, 33, 4) for a group
+    triplets:  (K, 3) point indices (a, b, c); the angle is taken at b
+    dims:      2 for image-plane angles from x, y; 3 to include z
+    directed:  2D only; counter-clockwise angle from b->a to b->c in [0, 360)
+               instead of the unsigned angle in [0, 180]
+    scale:     per-axis factors applied first, e.g. (frame_width, frame_height)
+               to measure in pixel space rather than normalized coordinates
+    min_visibility: when given, angles whose three points are not all at
+               least this visible (column 3) are NaN
+
+    Returns a (..., K) array of angles in degrees.
+    """
+    landmarks = np.asarray(landmarks, dtype=np.float64)
+    triplets = np.asarray(triplets).reshape(-1, 3)
+    points = landmarks[..., :dims]
+    if scale is not None:
+        points = points * np.asarray(scale, dtype=np.float64)
+
+    ba = points[..., triplets[:, 0], :] - points[..., triplets[:, 1], :]
+    bc = points[..., triplets[:, 2], :] - points[..., triplets[:, 1], :]
+    dot = (ba * bc).sum(axis=-1)
+    if dims == 2:
+        cross = ba[..., 0] * bc[..., 1] - ba[..., 1] * bc[..., 0]
+    else:
+        cross = np.linalg.norm(np.cross(ba, bc), axis=-1)
+
+    angles = np.degrees(np.arctan2(cross, dot))
+    angles = np.mod(angles, 360.0) if directed else np.abs(angles)
+
+    if min_visibility is not None:
+        visible = landmarks[..., triplets, 3].min(axis=-1) >= min_visibility
+        angles = np.where(visible, angles, np.nan)
+    return angles
+
+
+def triplet_points(a, b, c):
+    """
+    (3, dims) coordinates of three points and dims: x, y, z when the points
+    have at least three coordinates, otherwise x, y. Any further columns,
+    such as visibility, are not coordinates and are dropped.
+    """
+    points = np.array([a, b, c], dtype=np.float64)
+    dims = 3 if points.shape[-1] >= 3 else 2
+    return points[:, :dims], dims
+
+
+def is_degenerate(points):
+    """
+    True when a side b->a or b->c of a (3, dims) triplet has zero length.
+    """
+    return not (np.any(points[0] != points[1]) and np.any(points[2] != points[1]))
+
+
 def calculate_angle(a, b, c):
     """
     Calculates the angle (in degrees) between three points.
     Each point is in (x, y) format.
-    
+
     a = First point (e.g., shoulder)
     b = Mid point (e.g., elbow)
     c = End point (e.g., wrist)
-    
+
     Returns:
         Angle in degrees
     """
-    a = np.array(a)
-    b = np.array(b)
-    c = np.array(c)
-
-    # Calculate the vectors
-    ba = a - b
-    bc = c - b
-
-    # Cosine formula
-    cosine_angle = np.dot(ba, bc) / (np.linalg.norm(ba) * np.linalg.norm(bc))
-    angle = np.arccos(np.clip(cosine_angle, -1.0, 1.0))
-
-    return np.degrees(angle)
+    points, dims = triplet_points(a, b, c)
+    if is_degenerate(points):
+        # Zero-length side: undefined, as the cosine formula gave
+        return np.nan
+    return joint_angles(points, (0, 1, 2), dims=dims)[0]
 
 
 def get_point_coords(landmarks, index, frame_width, frame_height):
@@ -40,14 +91,4 @@ def get_point_coords(landmarks, index, frame_width, frame_height):
     y = int(landmarks[index][1] * frame_height)
     return (x, y)
 def calculate_angle_from_landmarks(landmarks, a_index, b_index, c_index):
-    a = np.array(landmarks[a_index])
-    b = np.array(landmarks[b_index])
-    c = np.array(landmarks[c_index])
-
-    radians = np.arctan2(c[1] - b[1], c[0] - b[0]) - np.arctan2(a[1] - b[1], a[0] - b[0])
-    angle = np.abs(radians * 180.0 / np.pi)
-
-    if angle > 180.0:
-        angle = 360 - angle
-
-    return angle
+    return joint_angles(landmarks, (a_index, b_index, c_index))[0]
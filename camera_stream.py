@@ -0,0 +1,101 @@
+# backend/pose_detection/camera_stream.py
+
+import threading
+import time
+from collections import deque
+
+import cv2
+
+from backend.pose_detection.capture_profile import open_camera
+from backend.pose_detection.frame_source import FrameSource
+
+
+class CameraStream(FrameSource):
+    """
+    FrameSource for the live camera. Grabs frames on a background thread into a small ring buffer,
+    so detection and rendering never block capture.
+
+    read() always hands back the newest frame together with its capture
+    timestamp and how many frames were dropped since the previous read.
+
+    An optional CaptureProfile is negotiated when the device is opened; what the
+    device actually granted is kept in `granted`. Frames larger than the
+    profile asked for are downscaled on the capture thread to fit within it,
+    keeping their aspect ratio.
+    """
+
+    def __init__(self, src=0, profile=None, buffer_size=2, read_timeout=1.0):
+        self.src = src
+        self.profile = profile
+        self.read_timeout = read_timeout
+        self.capture, self.granted = open_camera(src, profile)
+        self._resize_to = None
+        if profile is not None and self.granted and profile.needs_resize(self.granted):
+            self._resize_to = profile.fit_size(self.granted)
+
+        self._buffer = deque(maxlen=buffer_size)  # (seq, timestamp, frame)
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+        self._seq = 0
+        self._last_read_seq = 0
+        self.dropped_frames = 0
+
+    def start(self):
+        if self._thread is None and self.capture.isOpened():
+            self._running = True
+            self._thread = threading.Thread(target=self._update, daemon=True)
+            self._thread.start()
+        return self
+
+    def _update(self):
+        while self._running:
+            ret, frame = self.capture.read()
+            timestamp = time.time()
+            if ret and self._resize_to is not None:
+                frame = cv2.resize(frame, self._resize_to, interpolation=cv2.INTER_AREA)
+            with self._condition:
+                if not ret:
+                    self._running = False
+                    self._condition.notify_all()
+                    break
+                self._seq += 1
+                self._buffer.append((self._seq, timestamp, frame))
+                self._condition.notify_all()
+
+    def isOpened(self):
+        return self._running or bool(self._buffer)
+
+    def read(self):
+        """
+        Returns (ret, frame, timestamp, dropped) for the newest unseen frame.
+        Blocks until a new frame arrives or read_timeout expires.
+        """
+        with self._condition:
+            if not self._has_new_frame():
+                self._condition.wait_for(
+                    lambda: self._has_new_frame() or not self._running,
+                    timeout=self.read_timeout
+                )
+            if not self._has_new_frame():
+                return False, None, None, 0
+
+            seq, timestamp, frame = self._buffer[-1]
+            dropped = seq - self._last_read_seq - 1
+            self._last_read_seq = seq
+            self._buffer.clear()
+
+        self.dropped_frames += dropped
+        return True, frame, timestamp, dropped
+
+    def _has_new_frame(self):
+        return bool(self._buffer) and self._buffer[-1][0] > self._last_read_seq
+
+    def release(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        self.capture.release()
+        with self._condition:
+            self._buffer.clear()
@@ -0,0 +1,90 @@
+# backend/pose_detection/capture_profile.py
+
+import cv2
+
+from backend.pose_detection.mediapipe_model import PoseDetector
+
+
+class CaptureProfile:
+    """
+    Requested camera settings. apply() negotiates them with the device and
+    returns what the driver actually granted, since many webcams silently
+    ignore part of the request.
+    """
+
+    def __init__(self, width=640, height=480, fps=30, fourcc="MJPG", buffer_size=1):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.fourcc = fourcc
+        self.buffer_size = buffer_size
+
+    @classmethod
+    def for_pose_detector(cls, fps=30):
+        """
+        Profile sized to what PoseDetector consumes; anything larger is only
+        decoded to be thrown away before MediaPipe runs.
+        """
+        width, height = PoseDetector.FRAME_SIZE
+        return cls(width=width, height=height, fps=fps)
+
+    def apply(self, capture):
+        # FOURCC has to be set before the resolution on most V4L2/DirectShow drivers
+        if self.fourcc:
+            capture.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*self.fourcc))
+        if self.width and self.height:
+            capture.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+            capture.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        if self.fps:
+            capture.set(cv2.CAP_PROP_FPS, self.fps)
+        if self.buffer_size:
+            capture.set(cv2.CAP_PROP_BUFFERSIZE, self.buffer_size)
+        return granted_settings(capture)
+
+    def needs_resize(self, granted):
+        """
+        True when the device delivers larger frames than requested.
+        """
+        if not (self.width and self.height):
+            return False
+        return granted["width"] > self.width or granted["height"] > self.height
+
+    def fit_size(self, granted):
+        """
+        (width, height) of the granted frame scaled down to fit within the
+        requested size, keeping the device's aspect ratio.
+        """
+        scale = min(self.width / granted["width"], self.height / granted["height"], 1.0)
+        return max(1, round(granted["width"] * scale)), max(1, round(granted["height"] * scale))
+
+
+def decode_fourcc(value):
+    code = int(value)
+    chars = "".join(chr((code >> (8 * i)) & 0xFF) for i in range(4))
+    return chars if chars.strip("\x00") else ""
+
+
+def granted_settings(capture):
+    """
+    Reads back the settings the device is actually running with.
+    """
+    return {
+        "width": int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        "height": int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        "fps": capture.get(cv2.CAP_PROP_FPS),
+        "fourcc": decode_fourcc(capture.get(cv2.CAP_PROP_FOURCC)),
+        "buffer_size": int(capture.get(cv2.CAP_PROP_BUFFERSIZE)),
+    }
+
+
+def open_camera(src=0, profile=None):
+    """
+    Opens a camera and negotiates `profile` with it.
+    Returns (capture, granted) where granted is None if the device failed to open.
+    """
+    capture = cv2.VideoCapture(src)
+    if not capture.isOpened():
+        return capture, None
+    if profile is None:
+        return capture, granted_settings(capture)
+    return capture, profile.apply(capture)
@@ -0,0 +1,14 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.feedback_engine.reference_store import REFERENCE_STORE, compile_reference_store
+
+# Packs pose_references/, motion_references/ and the meditation pose into one
+# memory-mapped store. Re-run after recording or changing any reference;
+# sessions fall back to the original files for anything newer than the store.
+index = compile_reference_store(REFERENCE_STORE)
+
+for entry in index["entries"]:
+    print(f"✅ {entry['kind']:<10} {entry['name']:<20} {tuple(entry['shape'])}")
+print(f"📦 {len(index['entries'])} references, {index['size'] * 4 / 1e6:.2f} MB -> {REFERENCE_STORE}.f32 / {REFERENCE_STORE}.json")
@@ -0,0 +1,19 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+from backend.feedback_engine.motion_tools import save_compact_motion_reference, compact_motion_path
+
+# Writes the compact angle-space form next to every existing motion reference
+motion_folder = "motion_references"
+
+for file in sorted(os.listdir(motion_folder)):
+    if not file.endswith("_motion.npz"):
+        continue
+    path = os.path.join(motion_folder, file)
+    landmarks = np.load(path)["landmarks"]
+    compact = save_compact_motion_reference(path, landmarks)
+    before = os.path.getsize(path) / 1024
+    after = os.path.getsize(compact_motion_path(path)) / 1024
+    print(f"✅ {file}: {landmarks.shape} -> {compact.frames.shape}, {before:.0f} KB -> {after:.0f} KB")
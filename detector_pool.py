@@ -0,0 +1,117 @@
+# backend/pose_detection/detector_pool.py
+
+import threading
+
+import mediapipe as mp
+import numpy as np
+
+from backend.pose_detection.mediapipe_model import PoseDetector, create_pose_detector
+
+
+class ResourcePool:
+    """
+    Keeps initialized MediaPipe graphs alive for the whole process, so starting
+    a session or a Streamlit rerun does not pay graph initialization again.
+
+    acquire() hands out an idle instance (creating one if none is free) and
+    release() resets its tracking state before it goes back to the pool, so
+    the next user never inherits the previous user's tracked pose.
+    """
+
+    def __init__(self, factory, warm_up=None, max_idle=2):
+        self.factory = factory
+        self.warm_up = warm_up
+        self.max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+        self._warming = None
+
+    def _create(self):
+        resource = self.factory()
+        if self.warm_up is not None:
+            self.warm_up(resource)
+        resource.reset()
+        return resource
+
+    def prewarm(self):
+        """
+        Builds and warms one instance on a background thread. Safe to call on
+        every rerun; it only does work while the pool is empty.
+        """
+        with self._lock:
+            if self._idle or (self._warming is not None and self._warming.is_alive()):
+                return
+            self._warming = threading.Thread(target=self._prewarm_worker, daemon=True)
+            self._warming.start()
+
+    def _prewarm_worker(self):
+        resource = self._create()
+        with self._lock:
+            self._idle.append(resource)
+
+    def acquire(self):
+        warming = self._warming
+        if warming is not None and warming.is_alive():
+            # Finishing a warm-up in progress is cheaper than starting a new graph
+            warming.join()
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._create()
+
+    def release(self, resource):
+        resource.reset()
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(resource)
+                return
+        resource.close()
+
+
+def _warm_up_pose(detector):
+    width, height = PoseDetector.FRAME_SIZE
+    detector.detect_pose(np.zeros((height, width, 3), dtype=np.uint8))
+
+
+def _warm_up_face_mesh(face_mesh):
+    width, height = PoseDetector.FRAME_SIZE
+    face_mesh.process(np.zeros((height, width, 3), dtype=np.uint8))
+
+
+pose_detector_pool = ResourcePool(create_pose_detector, warm_up=_warm_up_pose)
+face_mesh_pool = ResourcePool(
+    lambda: mp.solutions.face_mesh.FaceMesh(refine_landmarks=True),
+    warm_up=_warm_up_face_mesh
+)
+# Without the iris refinement model; enough for the eye-closure check most of the time
+coarse_face_mesh_pool = ResourcePool(
+    lambda: mp.solutions.face_mesh.FaceMesh(refine_landmarks=False),
+    warm_up=_warm_up_face_mesh
+)
+
+
+def acquire_pose_detector():
+    return pose_detector_pool.acquire()
+
+
+def release_pose_detector(detector):
+    pose_detector_pool.release(detector)
+
+
+def acquire_face_mesh(refine=True):
+    return (face_mesh_pool if refine else coarse_face_mesh_pool).acquire()
+
+
+def release_face_mesh(face_mesh, refine=True):
+    (face_mesh_pool if refine else coarse_face_mesh_pool).release(face_mesh)
+
+
+def warm_up_in_background(face_mesh=False):
+    """
+    Starts warming a pose detector (and optionally a face mesh) so the first
+    session finds them ready.
+    """
+    pose_detector_pool.prewarm()
+    if face_mesh:
+        face_mesh_pool.prewarm()
+        coarse_face_mesh_pool.prewarm()
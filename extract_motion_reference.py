@@ -2,6 +2,8 @@ import cv2
 import os
 import numpy as np
 import mediapipe as mp
+from backend.pose_detection.frame_source import VideoFileSource
+from backend.feedback_engine.motion_tools import save_compact_motion_reference
 
 # 📂 Your Video
 VIDEO_PATH = "squats.mp4"  # Adjust if saved elsewhere
@@ -12,16 +14,12 @@ mp_pose = mp.solutions.pose
 pose = mp_pose.Pose(static_image_mode=False)
 
 # 🎥 Open Video
-cap = cv2.VideoCapture(VIDEO_PATH)
+source = VideoFileSource(VIDEO_PATH, realtime=False)
 
 frame_count = 0
 landmark_sequence = []
 
-while cap.isOpened():
-    ret, frame = cap.read()
-    if not ret:
-        break
-
+for frame in source:
     frame_count += 1
 
     # Only process every 5th frame (adjustable)
@@ -38,11 +36,12 @@ while cap.isOpened():
 
         landmark_sequence.append(frame_landmarks)
 
-cap.release()
+source.release()
 
 # ✅ Save as npz
 if landmark_sequence:
     np.savez_compressed(OUTPUT_PATH, landmarks=np.array(landmark_sequence))
+    save_compact_motion_reference(OUTPUT_PATH, np.array(landmark_sequence))
     print(f"✅ Saved motion sequence to: {OUTPUT_PATH}")
 else:
     print("⚠️ No landmarks detected!")
@@ -0,0 +1,122 @@
+# backend/pose_detection/eye_state.py
+
+import os
+
+import numpy as np
+
+# How often FaceMesh runs for the eye check; EAR is held in between
+EYE_CHECK_FPS = float(os.environ.get("AITHLETIQUE_EYE_FPS", "5"))
+
+# FaceMesh indices, per eye: outer corner, two upper lid points, inner corner, two lower lid points
+LEFT_EYE = [362, 385, 387, 263, 373, 380]
+RIGHT_EYE = [33, 160, 158, 133, 153, 144]
+EYE_INDICES = np.array(LEFT_EYE + RIGHT_EYE)
+
+# Pose landmarks 0-10 are the nose, eyes, ears and mouth
+HEAD_IDS = np.arange(11)
+
+
+def eye_aspect_ratio(eyes):
+    """
+    Mean eye aspect ratio of a (2, 6, 2) array holding both eyes in
+    LEFT_EYE / RIGHT_EYE order.
+    """
+    a = np.linalg.norm(eyes[:, 1] - eyes[:, 5], axis=-1)
+    b = np.linalg.norm(eyes[:, 2] - eyes[:, 4], axis=-1)
+    c = np.linalg.norm(eyes[:, 0] - eyes[:, 3], axis=-1)
+    return float(((a + b) / (2.0 * c)).mean())
+
+
+class EyeStateEstimator:
+    """
+    Eye-closure signal for meditation without running FaceMesh on every full frame.
+
+    The face is cropped around pose landmarks 0-10 and FaceMesh runs on that
+    crop at most `fps` times a second; the EAR is held between updates. Eye
+    points are mapped back to full-frame normalized coordinates, so the EAR and
+    its threshold mean the same as on the full frame. The refined (iris) mesh
+    is only used when the face is small in the image or the EAR is close to
+    the open/closed threshold; otherwise the cheaper unrefined mesh is used.
+    Without usable head landmarks the full frame is processed.
+    """
+
+    def __init__(self, face_mesh, refined_face_mesh=None, fps=EYE_CHECK_FPS, threshold=0.25,
+                 refine_margin=0.03, refine_below=120, padding=0.6, min_visibility=0.5):
+        self.face_mesh = face_mesh
+        self.refined_face_mesh = refined_face_mesh or face_mesh
+        self.interval = 1.0 / fps if fps else 0.0
+        self.threshold = threshold
+        self.refine_margin = refine_margin
+        self.refine_below = refine_below  # crop side in pixels under which refine is used
+        self.padding = padding
+        self.min_visibility = min_visibility
+
+        self.ear = None
+        self.refined = False
+        self._last_update = None
+        self._eyes = np.zeros((2, 6, 2), dtype=np.float32)
+
+    @property
+    def eyes_open(self):
+        return self.ear is not None and self.ear > self.threshold
+
+    def due(self, timestamp):
+        return self._last_update is None or timestamp - self._last_update >= self.interval
+
+    def update(self, rgb, pose_landmarks, timestamp):
+        """
+        Runs FaceMesh when the update is due and returns the (possibly held)
+        EAR, or None when no face was found.
+        """
+        if not self.due(timestamp):
+            return self.ear
+        self._last_update = timestamp
+
+        height, width = rgb.shape[:2]
+        box = self._face_box(pose_landmarks, width, height)
+        if box is None:
+            x0, y0, x1, y1 = 0, 0, width, height
+        else:
+            x0, y0, x1, y1 = box
+
+        near_threshold = self.ear is not None and abs(self.ear - self.threshold) < self.refine_margin
+        self.refined = near_threshold or (box is not None and x1 - x0 < self.refine_below)
+        mesh = self.refined_face_mesh if self.refined else self.face_mesh
+
+        crop = np.ascontiguousarray(rgb[y0:y1, x0:x1])
+        face_results = mesh.process(crop)
+        if not face_results.multi_face_landmarks:
+            self.ear = None
+            return None
+
+        # The protobuf landmarks have to be read one by one; after that the eyes are one gather
+        face = np.array([(lm.x, lm.y) for lm in face_results.multi_face_landmarks[0].landmark], dtype=np.float32)
+        eyes = self._eyes.reshape(12, 2)
+        np.take(face, EYE_INDICES, axis=0, out=eyes)
+        # Crop-normalized -> full-frame normalized
+        eyes *= ((x1 - x0) / width, (y1 - y0) / height)
+        eyes += (x0 / width, y0 / height)
+        self.ear = eye_aspect_ratio(self._eyes)
+        return self.ear
+
+    def _face_box(self, pose_landmarks, width, height):
+        if pose_landmarks is None:
+            return None
+        head = pose_landmarks[HEAD_IDS]
+        head = head[head[:, 3] >= self.min_visibility]
+        if len(head) < 3:
+            return None
+
+        cx, cy = head[:, 0].mean() * width, head[:, 1].mean() * height
+        span = max(np.ptp(head[:, 0]) * width, np.ptp(head[:, 1]) * height)
+        # Head landmarks cover eyes to mouth; pad out to forehead and chin
+        half = span * (0.5 + self.padding)
+        x0, y0 = int(max(cx - half, 0)), int(max(cy - half, 0))
+        x1, y1 = int(min(cx + half, width)), int(min(cy + half, height))
+        if x1 - x0 < 16 or y1 - y0 < 16:
+            return None
+        return x0, y0, x1, y1
+
+    def reset(self):
+        self.ear = None
+        self._last_update = None
@@ -0,0 +1,81 @@
+# backend/pose_detection/frame_buffers.py
+
+import os
+import tracemalloc
+
+import cv2
+import numpy as np
+
+# Measure Python/NumPy bytes allocated per loop iteration (adds tracing overhead)
+TRACE_FRAME_ALLOCATIONS = os.environ.get("AITHLETIQUE_TRACE_ALLOC", "0") == "1"
+
+
+class FrameBuffers:
+    """
+    Reusable buffers for the capture-to-inference path. mirror() flips the
+    captured frame in place and to_rgb() converts it once into an RGB buffer
+    that is allocated on the first frame and reused afterwards, so the pose and
+    face models can share the same RGB image.
+
+    bytes_allocated counts every byte this object has allocated; it only grows
+    when the frame size changes.
+    """
+
+    def __init__(self):
+        self.rgb = None
+        self.bytes_allocated = 0
+
+    @staticmethod
+    def mirror(frame):
+        return cv2.flip(frame, 1, dst=frame)
+
+    def to_rgb(self, frame):
+        if self.rgb is None or self.rgb.shape != frame.shape:
+            self.rgb = np.empty_like(frame)
+            self.bytes_allocated += self.rgb.nbytes
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self.rgb)
+
+
+class AllocationCounter:
+    """
+    Per-frame allocation counter based on tracemalloc. NumPy reports its array
+    buffers to tracemalloc, so a full-frame copy shows up as ~0.9 MB at 640x480.
+
+    Call begin_frame()/end_frame() around one loop iteration; last_bytes is the
+    peak memory allocated above the starting point during that frame and
+    average_bytes its running mean. Does nothing unless enabled.
+    """
+
+    def __init__(self, enabled=TRACE_FRAME_ALLOCATIONS):
+        self.enabled = enabled
+        self.frames = 0
+        self.last_bytes = 0
+        self.total_bytes = 0
+        self._start = 0
+        self._started_tracing = False
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        tracemalloc.reset_peak()
+        self._start = tracemalloc.get_traced_memory()[0]
+
+    def end_frame(self):
+        if not self.enabled or not tracemalloc.is_tracing():
+            return
+        peak = tracemalloc.get_traced_memory()[1]
+        self.last_bytes = max(0, peak - self._start)
+        self.total_bytes += self.last_bytes
+        self.frames += 1
+
+    @property
+    def average_bytes(self):
+        return self.total_bytes / self.frames if self.frames else 0.0
+
+    def stop(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
@@ -0,0 +1,162 @@
+# backend/feedback_engine/frame_features.py
+
+import functools
+
+import numpy as np
+
+from backend.feedback_engine.angles import joint_angles
+from backend.feedback_engine.pose_normalization import normalize_pose
+
+
+def _visibility(features):
+    return features._landmarks[:, 3]
+
+
+def _canonical(features):
+    return normalize_pose(features._landmarks)
+
+
+def _important_angles(features):
+    # pose_comparator's analyzers take FrameFeatures, so import it lazily
+    from backend.feedback_engine.pose_comparator import ANGLE_TRIPLETS
+    return joint_angles(features._landmarks[:, :3], ANGLE_TRIPLETS, dims=3)
+
+
+def _distances(features):
+    points = features._landmarks[:, :3]
+    return np.linalg.norm(points[:, None] - points[None], axis=-1)
+
+
+class FrameFeatures:
+    """
+    Everything the analyzers of one frame derive from its landmarks, computed
+    on first access and memoized for the frame:
+
+    visibility          (33,) visibility column
+    canonical           (33, 4) hip-centered, torso-scaled pose
+    important_angles    (8,) 3D angles of ANGLE_TRIPLETS
+    distances           (33, 33) pairwise xyz distances
+
+    plus visible(threshold), angles(triplets, ...) and distance(i, j), memoized
+    per argument. Features already known by the caller can be passed in, e.g.
+    FrameFeatures(landmarks, canonical=normalizer.update(...)). Analyzers
+    declare what they read with @reads; while one runs, reading anything else
+    from its FrameFeatures is reported. `computed` lists what a frame
+    actually needed.
+    """
+
+    FEATURES = {
+        "visibility": _visibility,
+        "canonical": _canonical,
+        "important_angles": _important_angles,
+        "distances": _distances,
+    }
+    # What @reads accepts besides FEATURES
+    ACCESSORS = ("landmarks", "visible", "angles", "distance")
+
+    def __init__(self, landmarks, **known):
+        self._landmarks = np.asarray(landmarks, dtype=np.float32)
+        self._cache = dict(known)
+        # (analyzer, declared names) while a @reads analyzer runs on this frame
+        self._reader = None
+
+    def __getattr__(self, name):
+        if name not in FrameFeatures.FEATURES:
+            raise AttributeError(name)
+        self._check_read(name)
+        return self._feature(name)
+
+    def _feature(self, name):
+        # Unchecked, for features computed from other features
+        cache = self.__dict__["_cache"]
+        if name not in cache:
+            cache[name] = FrameFeatures.FEATURES[name](self)
+        return cache[name]
+
+    def _check_read(self, name):
+        reader = self._reader
+        if reader is not None and name not in reader[1]:
+            _report_undeclared(reader[0], name)
+
+    @property
+    def landmarks(self):
+        self._check_read("landmarks")
+        return self._landmarks
+
+    def __len__(self):
+        return len(self._landmarks)
+
+    @property
+    def computed(self):
+        return sorted(self._cache, key=str)
+
+    def _memo(self, key, compute):
+        value = self._cache.get(key)
+        if value is None:
+            value = self._cache[key] = compute()
+        return value
+
+    def visible(self, threshold=0.5):
+        self._check_read("visible")
+        return self._memo(("visible", threshold), lambda: self._feature("visibility") >= threshold)
+
+    def angles(self, triplets, dims=2, directed=False, scale=None):
+        self._check_read("angles")
+        triplets = np.asarray(triplets).reshape(-1, 3)
+        key = ("angles", triplets.tobytes(), dims, directed, None if scale is None else tuple(scale))
+        return self._memo(key, lambda: joint_angles(self._landmarks, triplets, dims, directed, scale))
+
+    def distance(self, i, j):
+        self._check_read("distance")
+        if "distances" in self._cache:
+            return float(self._cache["distances"][i, j])
+        points = self._landmarks[:, :3]
+        return self._memo(("distance", i, j), lambda: float(np.linalg.norm(points[i] - points[j])))
+
+
+def as_features(landmarks):
+    """
+    Lets analyzers take either raw landmarks or the frame's FrameFeatures.
+    """
+    if isinstance(landmarks, FrameFeatures):
+        return landmarks
+    return FrameFeatures(landmarks)
+
+
+_undeclared = set()
+
+
+def _report_undeclared(analyzer, name):
+    if (analyzer, name) not in _undeclared:
+        _undeclared.add((analyzer, name))
+        print(f"[FrameFeatures] {analyzer} reads '{name}' without declaring it in @reads")
+
+
+def reads(*names):
+    """
+    Declares the FrameFeatures an analyzer reads. While the analyzer runs,
+    every FrameFeatures passed to it positionally reports (once per analyzer
+    and feature) any read outside the declaration.
+    """
+    unknown = set(names) - set(FrameFeatures.FEATURES) - set(FrameFeatures.ACCESSORS)
+    if unknown:
+        raise ValueError(f"Unknown frame features: {sorted(unknown)}")
+    declared = frozenset(names)
+
+    def decorate(analyzer):
+        label = analyzer.__qualname__
+
+        @functools.wraps(analyzer)
+        def checked(*args, **kwargs):
+            frames = [arg for arg in args if isinstance(arg, FrameFeatures)]
+            previous = [frame._reader for frame in frames]
+            for frame in frames:
+                frame._reader = (label, declared)
+            try:
+                return analyzer(*args, **kwargs)
+            finally:
+                for frame, reader in zip(frames, previous):
+                    frame._reader = reader
+        checked.reads = names
+        return checked
+    return decorate
@@ -0,0 +1,96 @@
+# backend/pose_detection/frame_scheduler.py
+
+import math
+import time
+
+
+class FrameScheduler:
+    """
+    Paces a frame loop against a target FPS.
+
+    Each iteration is wrapped in begin_frame()/end_frame(). end_frame() sleeps
+    only for whatever is left of the frame budget. When the loop keeps
+    overrunning its budget, should_run() starts skipping optional stages so
+    the essential ones (capture, detection, display) keep up.
+
+    A target_fps of None leaves the loop unthrottled, for sources such as
+    video files that are replayed as fast as possible.
+    """
+
+    def __init__(self, target_fps=15, smoothing=0.9):
+        self.smoothing = smoothing
+        self.set_target_fps(target_fps)
+        # Both averages start at their first measurement, so early frames are not averaged with zero
+        self.work_time = None
+        self.frame_period = None
+        self.frame_count = 0
+        self._stage_runs = {}
+        self._frame_start = None
+        self._last_frame_start = None
+
+    def set_target_fps(self, target_fps):
+        self.target_fps = target_fps
+        self.budget = 1.0 / target_fps if target_fps else 0.0
+
+    def _smooth(self, average, value):
+        if average is None:
+            return value
+        return self.smoothing * average + (1 - self.smoothing) * value
+
+    def begin_frame(self):
+        now = time.perf_counter()
+        if self._last_frame_start is not None:
+            period = now - self._last_frame_start
+            self.frame_period = self._smooth(self.frame_period, period)
+        self._last_frame_start = now
+        self._frame_start = now
+        self.frame_count += 1
+
+    def end_frame(self):
+        """
+        Records how long the iteration took and sleeps for the leftover budget.
+        Returns the time slept in seconds.
+        """
+        if self._frame_start is None:
+            return 0.0
+        elapsed = time.perf_counter() - self._frame_start
+        self.work_time = self._smooth(self.work_time, elapsed)
+        self._frame_start = None
+
+        remaining = self.budget - elapsed
+        if remaining > 0:
+            time.sleep(remaining)
+            return remaining
+        return 0.0
+
+    @property
+    def behind(self):
+        return self.budget > 0 and self.work_time is not None and self.work_time > self.budget
+
+    @property
+    def skip_factor(self):
+        """
+        1 when on budget, otherwise how many frames an optional stage is spread over.
+        """
+        if not self.behind:
+            return 1
+        return math.ceil(self.work_time / self.budget)
+
+    def should_run(self, stage, every=1):
+        """
+        Whether an optional stage should run on this frame. A stage runs every
+        `every` frames while on budget, and that interval is stretched by
+        skip_factor while the loop is running behind.
+        """
+        interval = max(1, every) * self.skip_factor
+        last_run = self._stage_runs.get(stage)
+        if last_run is None or self.frame_count - last_run >= interval:
+            self._stage_runs[stage] = self.frame_count
+            return True
+        return False
+
+    @property
+    def achieved_fps(self):
+        if not self.frame_period:
+            return 0.0
+        return 1.0 / self.frame_period
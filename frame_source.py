@@ -0,0 +1,160 @@
+# backend/pose_detection/frame_source.py
+
+import os
+import time
+
+import cv2
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+class FrameSource:
+    """
+    Common interface for everything that feeds frames into a session loop or
+    an offline tool: the live camera (CameraStream), video files and image folders.
+
+    read() returns (ret, frame, timestamp, dropped) like CameraStream.read().
+    Iterating a source yields frames until it is exhausted.
+    """
+
+    # Whether frames arrive at wall-clock pace; unpaced sources run as fast as the consumer
+    realtime = True
+    # Camera settings the device granted; only live cameras negotiate any
+    granted = None
+
+    def read(self):
+        raise NotImplementedError
+
+    def isOpened(self):
+        raise NotImplementedError
+
+    def release(self):
+        pass
+
+    def __iter__(self):
+        while self.isOpened():
+            ret, frame, _, _ = self.read()
+            if not ret:
+                break
+            yield frame
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class VideoFileSource(FrameSource):
+    """
+    Plays a video file. With realtime=True frames are paced to the file's FPS
+    and frames the consumer is too slow for are skipped, exactly like a live
+    camera. With realtime=False every frame is returned as fast as it is read.
+    Timestamps follow the media clock in both modes.
+    """
+
+    def __init__(self, path, realtime=True, fallback_fps=30.0):
+        self.path = path
+        self.realtime = realtime
+        self.capture = cv2.VideoCapture(path)
+        fps = self.capture.get(cv2.CAP_PROP_FPS)
+        self.fps = fps if fps and fps > 0 else fallback_fps
+        self.frame_index = -1
+        self.dropped_frames = 0
+        self._exhausted = False
+        self._start_time = None
+
+    def isOpened(self):
+        return self.capture.isOpened() and not self._exhausted
+
+    def read(self):
+        if self._start_time is None:
+            self._start_time = time.time()
+
+        dropped = 0
+        if self.realtime:
+            # Skip frames whose presentation time has already passed
+            due_index = int((time.time() - self._start_time) * self.fps)
+            while self.frame_index + 1 < due_index:
+                if not self.capture.grab():
+                    self._exhausted = True
+                    return False, None, None, dropped
+                self.frame_index += 1
+                dropped += 1
+
+        ret, frame = self.capture.read()
+        if not ret:
+            self._exhausted = True
+            return False, None, None, dropped
+        self.frame_index += 1
+
+        timestamp = self._start_time + self.frame_index / self.fps
+        if self.realtime:
+            delay = timestamp - time.time()
+            if delay > 0:
+                time.sleep(delay)
+
+        self.dropped_frames += dropped
+        return True, frame, timestamp, dropped
+
+    def release(self):
+        self.capture.release()
+
+
+class ImageFolderSource(FrameSource):
+    """
+    Reads every image in a folder in sorted order. Unreadable files are skipped
+    and listed in `skipped`; the path of the last returned image is `current_path`.
+    """
+
+    realtime = False
+
+    def __init__(self, folder, extensions=IMAGE_EXTENSIONS, fps=30.0):
+        self.folder = folder
+        self.paths = sorted(
+            os.path.join(folder, f) for f in os.listdir(folder)
+            if f.lower().endswith(extensions)
+        )
+        self.fps = fps
+        self.current_path = None
+        self.skipped = []
+        self._next = 0
+        self._start_time = None
+
+    def __len__(self):
+        return len(self.paths)
+
+    def isOpened(self):
+        return self._next < len(self.paths)
+
+    def read(self):
+        if self._start_time is None:
+            self._start_time = time.time()
+
+        while self._next < len(self.paths):
+            path = self.paths[self._next]
+            index = self._next
+            self._next += 1
+            frame = cv2.imread(path)
+            if frame is None:
+                self.skipped.append(path)
+                continue
+            self.current_path = path
+            return True, frame, self._start_time + index / self.fps, 0
+        return False, None, None, 0
+
+
+def open_frame_source(source=0, profile=None, realtime=True):
+    """
+    Picks the FrameSource for `source`: a camera index opens the live camera
+    with `profile`, a folder opens an ImageFolderSource and anything else is
+    treated as a video file.
+    """
+    if isinstance(source, FrameSource):
+        return source
+    if isinstance(source, int):
+        from backend.pose_detection.camera_stream import CameraStream
+        return CameraStream(source, profile=profile).start()
+    if os.path.isdir(source):
+        return ImageFolderSource(source)
+    return VideoFileSource(source, realtime=realtime)
@@ -0,0 +1,111 @@
+# backend/pose_detection/landmark_filter.py
+
+import math
+
+import numpy as np
+
+from backend.pose_detection.mediapipe_model import landmarks_to_results
+
+
+class OneEuroFilter:
+    """
+    One-Euro filter applied to a whole (33, 4) landmark array at once.
+
+    Slow movement is smoothed hard (min_cutoff) to kill jitter, fast movement
+    raises the cutoff (beta) so reps are not lagged. The filtered velocity also
+    lets predict() extrapolate landmarks for frames where detection was skipped.
+
+    Landmarks are normalized, so speeds are small (a squat moves ~0.1-0.5 units/s)
+    and beta is correspondingly large.
+
+    update() and predict() return the filter's own state buffer; copy it to keep it.
+    """
+
+    def __init__(self, min_cutoff=1.0, beta=50.0, d_cutoff=1.0, max_extrapolation=0.25, shape=(33, 4)):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.max_extrapolation = max_extrapolation
+
+        self._x = np.zeros(shape, dtype=np.float32)
+        self._dx = np.zeros(shape, dtype=np.float32)
+        self._out = np.zeros(shape, dtype=np.float32)
+        self._scratch = np.zeros(shape, dtype=np.float32)
+        self._last_time = None
+
+    @property
+    def ready(self):
+        return self._last_time is not None
+
+    def reset(self):
+        self._last_time = None
+
+    @staticmethod
+    def _alpha(cutoff, dt):
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def update(self, landmarks, timestamp):
+        """
+        Feeds a detected landmark array captured at `timestamp` (seconds) and
+        returns the filtered array.
+        """
+        if self._last_time is None or timestamp <= self._last_time:
+            np.copyto(self._x, landmarks)
+            self._dx.fill(0)
+            self._last_time = timestamp
+            np.copyto(self._out, self._x)
+            return self._out
+
+        dt = timestamp - self._last_time
+        self._last_time = timestamp
+
+        # Derivative, smoothed with a fixed cutoff
+        raw_dx = self._scratch
+        np.subtract(landmarks, self._x, out=raw_dx)
+        raw_dx /= dt
+        a_d = self._alpha(self.d_cutoff, dt)
+        self._dx += a_d * (raw_dx - self._dx)
+
+        # Per-value cutoff grows with speed
+        cutoff = np.abs(self._dx, out=raw_dx)
+        cutoff *= self.beta
+        cutoff += self.min_cutoff
+        tau = 1.0 / (2 * math.pi * cutoff)
+        alpha = 1.0 / (1.0 + tau / dt)
+        self._x += alpha * (landmarks - self._x)
+
+        np.copyto(self._out, self._x)
+        return self._out
+
+    def predict(self, timestamp):
+        """
+        Constant-velocity extrapolation of the positions to `timestamp`, capped at
+        max_extrapolation seconds past the last detection. Visibility is held.
+        Returns None before the first update.
+        """
+        if self._last_time is None:
+            return None
+        horizon = min(max(timestamp - self._last_time, 0.0), self.max_extrapolation)
+        np.copyto(self._out, self._x)
+        self._out[:, :3] += self._dx[:, :3] * horizon
+        return self._out
+
+
+def track_landmarks(detector, landmark_filter, frame, timestamp, detect=True):
+    """
+    Returns (results, landmarks) for a frame. When `detect` is set the detector
+    runs and its landmarks go through the filter; otherwise the landmarks are
+    extrapolated from the filter and wrapped in a PoseResults for drawing.
+    landmarks is None when nobody is detected.
+    """
+    if detect or not landmark_filter.ready:
+        results = detector.detect_pose(frame)
+        raw = detector.get_landmarks_array(results)
+        if raw is None:
+            landmark_filter.reset()
+            return results, None
+        return results, landmark_filter.update(raw, timestamp)
+
+    landmarks = landmark_filter.predict(timestamp)
+    return landmarks_to_results(landmarks), landmarks
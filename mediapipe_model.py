@@ -1,34 +1,339 @@
 # mediapipe_model.py
 
+import logging
+import os
+import time
+
 import cv2
 import mediapipe as mp
+import numpy as np
+from mediapipe.framework.formats import landmark_pb2
+
+# "inline" runs MediaPipe in the calling thread, "process" in a worker process,
+# "tasks" uses the Tasks PoseLandmarker in LIVE_STREAM mode
+POSE_INFERENCE_MODE = os.environ.get("AITHLETIQUE_POSE_MODE", "inline")
+# Run inference on a crop around the previous frame's pose instead of the full frame
+POSE_ROI_TRACKING = os.environ.get("AITHLETIQUE_POSE_ROI", "0") == "1"
+# Switch between the lite, full and heavy models at runtime; off by default since
+# the lite and heavy models are downloaded the first time they are switched to
+POSE_ADAPTIVE_COMPLEXITY = os.environ.get("AITHLETIQUE_POSE_ADAPTIVE", "0") == "1"
+
+NUM_LANDMARKS = 33
+# Landmark name -> row in a (33, 4) landmark array, e.g. LANDMARK_INDEX['LEFT_SHOULDER'] == 11
+LANDMARK_INDEX = {lm.name: lm.value for lm in mp.solutions.pose.PoseLandmark}
+
+
+class LandmarkView:
+    """
+    Named access into a (33, 4) landmark array without copying:
+    view.LEFT_SHOULDER is the row (x, y, z, visibility) of the underlying array.
+    """
+
+    __slots__ = ("array",)
+
+    def __init__(self, array):
+        self.array = array
+
+    def __getattr__(self, name):
+        try:
+            return self.array[LANDMARK_INDEX[name]]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.array[LANDMARK_INDEX[key]]
+        return self.array[key]
+
+
+class PoseResults:
+    """
+    Stand-in for MediaPipe's solution output when landmarks come from somewhere
+    other than mp.solutions.pose (a worker process, another backend).
+    Multi-pose backends also set `people`, a (P, 33, 4) array of everyone found.
+    """
+
+    def __init__(self, pose_landmarks=None, landmarks_array=None, people=None):
+        self.pose_landmarks = pose_landmarks
+        self.landmarks_array = landmarks_array
+        self.people = people
+
+
+def landmarks_to_results(landmarks):
+    """
+    Wraps a (33, 4) array of (x, y, z, visibility) in a PoseResults whose
+    pose_landmarks is a regular NormalizedLandmarkList, so drawing and
+    get_landmarks work unchanged.
+    """
+    if landmarks is None:
+        return PoseResults()
+    landmark_list = landmark_pb2.NormalizedLandmarkList()
+    for x, y, z, visibility in landmarks:
+        landmark_list.landmark.add(x=float(x), y=float(y), z=float(z), visibility=float(visibility))
+    return PoseResults(landmark_list, landmarks)
+
+
+def create_pose_detector(mode=None, num_poses=1):
+    """
+    Returns the pose detector for the configured inference mode. Tracking more
+    than one person needs the Tasks backend, whatever the mode.
+    """
+    if num_poses > 1:
+        from backend.pose_detection.tasks_pose import TasksPoseDetector
+        return TasksPoseDetector(num_poses=num_poses)
+    mode = mode or POSE_INFERENCE_MODE
+    if mode == "process":
+        from backend.pose_detection.pose_worker import ProcessPoseDetector
+        return ProcessPoseDetector()
+    if mode == "tasks":
+        from backend.pose_detection.tasks_pose import TasksPoseDetector
+        try:
+            return TasksPoseDetector()
+        except (FileNotFoundError, RuntimeError) as e:
+            print(f"[PoseDetector] Tasks backend unavailable, using solutions pose: {e}")
+    return PoseDetector(roi_tracking=POSE_ROI_TRACKING, adaptive_complexity=POSE_ADAPTIVE_COMPLEXITY)
+
 
 class PoseDetector:
-    def __init__(self):
+    # Frame size the session loops feed in; MediaPipe downsamples internally anyway
+    FRAME_SIZE = (640, 480)
+
+    landmark_map = {
+        11: 'LEFT_SHOULDER',
+        12: 'RIGHT_SHOULDER',
+        23: 'LEFT_HIP',
+        24: 'RIGHT_HIP',
+        25: 'LEFT_KNEE',
+        26: 'RIGHT_KNEE',
+        27: 'LEFT_ANKLE',
+        28: 'RIGHT_ANKLE',
+    }
+
+    # Landmarks that must stay confidently visible inside the crop
+    ROI_TORSO_IDS = [11, 12, 23, 24]
+    # Body landmarks whose visibility decides whether a heavier model is worth it
+    BODY_IDS = [11, 12, 13, 14, 15, 16, 23, 24, 25, 26, 27, 28]
+
+    # Mean landmark displacement per frame (normalized units) for fast / still motion
+    FAST_MOTION = 0.02
+    STILL_MOTION = 0.004
+    LOW_VISIBILITY = 0.7
+
+    def __init__(self, roi_tracking=False, roi_padding=0.25, roi_max_side=320, roi_min_visibility=0.6,
+                 model_complexity=1, adaptive_complexity=False, frame_budget=None, switch_hold=15):
         self.mp_pose = mp.solutions.pose
-        self.pose = self.mp_pose.Pose(
-            static_image_mode=False,
-            model_complexity=1,
-            enable_segmentation=False,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
-        )
         self.mp_drawing = mp.solutions.drawing_utils
 
-        self.landmark_map = {
-            11: 'LEFT_SHOULDER',
-            12: 'RIGHT_SHOULDER',
-            23: 'LEFT_HIP',
-            24: 'RIGHT_HIP',
-            25: 'LEFT_KNEE',
-            26: 'RIGHT_KNEE',
-            27: 'LEFT_ANKLE',
-            28: 'RIGHT_ANKLE',
-        }
-
-    def detect_pose(self, frame):
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        return self.pose.process(rgb_frame)
+        self.default_complexity = model_complexity
+        self.model_complexity = model_complexity
+        self.served_complexity = model_complexity  # model that produced the last result
+        self.adaptive_complexity = adaptive_complexity
+        self.frame_budget = frame_budget  # seconds inference may take per frame, None for no limit
+        self.switch_hold = switch_hold
+        self._graphs = {}
+        self._latency = {}
+        self._unavailable = set()
+        self._frames_since_switch = 0
+        self._previous_xy = None
+        self.pose = self._graph(model_complexity)
+
+        self.roi_tracking = roi_tracking
+        self.roi_padding = roi_padding
+        self.roi_max_side = roi_max_side
+        self.roi_min_visibility = roi_min_visibility
+        self.roi = None  # (x0, y0, x1, y1) in pixels of the last frame, or None
+        self.used_roi = False
+
+    def _graph(self, complexity, roi=False):
+        # Crops get their own graphs: MediaPipe's internal tracking assumes
+        # consecutive inputs share one coordinate frame
+        key = (complexity, roi)
+        graph = self._graphs.get(key)
+        if graph is None:
+            graph = self._graphs[key] = self.mp_pose.Pose(
+                static_image_mode=False,
+                model_complexity=complexity,
+                enable_segmentation=False,
+                min_detection_confidence=0.5,
+                min_tracking_confidence=0.5
+            )
+        return graph
+
+    def set_frame_budget(self, frame_budget, share=0.6):
+        """
+        Lets inference use `share` of a loop's per-frame budget; a budget of 0
+        or None (unthrottled loops) removes the latency limit.
+        """
+        self.frame_budget = frame_budget * share if frame_budget else None
+
+    def detect_pose(self, frame, rgb=None):
+        """
+        Runs pose detection on a BGR frame. Pass `rgb` when the caller already has
+        the RGB version of the frame (e.g. shared with FaceMesh) to skip the
+        conversion; otherwise it is converted into a buffer reused across calls. With roi_tracking, inference runs on a
+        padded, downscaled crop around the previous pose and the landmarks are
+        mapped back to full-frame normalized coordinates; whenever the crop
+        result is not confident the full frame is used instead.
+
+        With adaptive_complexity the model is switched between lite, full and
+        heavy from measured latency, motion and visibility. served_complexity
+        tells which model produced the returned result.
+        """
+        complexity = self.model_complexity
+        start = time.perf_counter()
+        if rgb is None:
+            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self._rgb_buffer(frame))
+        results = self._process(rgb, complexity)
+        elapsed = time.perf_counter() - start
+        self.served_complexity = complexity
+
+        if self.adaptive_complexity:
+            results = self._adapt_complexity(rgb, results, elapsed)
+        return results
+
+    def _process(self, rgb, complexity):
+        self.used_roi = False
+        if self.roi_tracking and self.roi is not None:
+            results = self._detect_in_roi(rgb, complexity)
+            if results is not None:
+                self.used_roi = True
+                return results
+
+        results = self._graph(complexity).process(rgb)
+        if self.roi_tracking:
+            self._update_roi(results, rgb.shape)
+        return results
+
+    def _adapt_complexity(self, rgb, results, elapsed):
+        current = self.model_complexity
+        previous = self._latency.get(current)
+        self._latency[current] = elapsed if previous is None else 0.8 * previous + 0.2 * elapsed
+        self._frames_since_switch += 1
+
+        target = self._choose_complexity(results)
+        if target == current or self._frames_since_switch < self.switch_hold:
+            return results
+
+        # Hand over on the same frame: only switch once the new model has
+        # found the pose, so consumers never see a frame without landmarks
+        try:
+            candidate = self._process(rgb, target)
+        except Exception as e:
+            # Lite/heavy models are downloaded on first use and may be missing offline
+            logging.warning(f"[PoseDetector] model_complexity={target} unavailable, staying on {current}: {e}")
+            self._unavailable.add(target)
+            return results
+        if not candidate.pose_landmarks:
+            return results
+        # The graphs being left would resume from stale tracking state later
+        for roi in (False, True):
+            graph = self._graphs.get((current, roi))
+            if graph is not None:
+                graph.reset()
+        self.model_complexity = target
+        self.served_complexity = target
+        self.pose = self._graph(target)
+        self._frames_since_switch = 0
+        return candidate
+
+    def _choose_complexity(self, results):
+        current = self.model_complexity
+        if not results.pose_landmarks:
+            self._previous_xy = None
+            return current
+
+        landmarks = results.pose_landmarks.landmark
+        xy = np.array([(landmarks[i].x, landmarks[i].y) for i in self.BODY_IDS])
+        visibility = sum(landmarks[i].visibility for i in self.BODY_IDS) / len(self.BODY_IDS)
+        motion = np.abs(xy - self._previous_xy).mean() if self._previous_xy is not None else 0.0
+        self._previous_xy = xy
+
+        latency = self._latency[current]
+        if current > 0 and current - 1 not in self._unavailable and (motion > self.FAST_MOTION or (self.frame_budget and latency > self.frame_budget)):
+            return current - 1
+
+        if current < 2 and current + 1 not in self._unavailable and (motion < self.STILL_MOTION or visibility < self.LOW_VISIBILITY):
+            # The heavy model costs roughly 2-3x the full one until it has been measured
+            expected = self._latency.get(current + 1, latency * 2.5)
+            if not self.frame_budget or expected < 0.8 * self.frame_budget:
+                return current + 1
+        return current
+
+    def _detect_in_roi(self, rgb, complexity):
+        x0, y0, x1, y1 = self.roi
+        crop_w, crop_h = x1 - x0, y1 - y0
+        crop = rgb[y0:y1, x0:x1]
+        scale = self.roi_max_side / max(crop_w, crop_h)
+        if scale < 1:
+            crop = cv2.resize(crop, (max(1, int(crop_w * scale)), max(1, int(crop_h * scale))), interpolation=cv2.INTER_AREA)
+        else:
+            crop = np.ascontiguousarray(crop)
+
+        results = self._graph(complexity, roi=True).process(crop)
+        if not self._roi_result_confident(results, rgb.shape):
+            self.roi = None
+            return None
+
+        height, width = rgb.shape[:2]
+        for lm in results.pose_landmarks.landmark:
+            lm.x = (lm.x * crop_w + x0) / width
+            lm.y = (lm.y * crop_h + y0) / height
+            # MediaPipe scales z like x, i.e. by the width of its input image
+            lm.z = lm.z * crop_w / width
+        self._update_roi(results, rgb.shape)
+        return results
+
+    def _roi_result_confident(self, results, frame_shape):
+        if not results.pose_landmarks:
+            return False
+        landmarks = results.pose_landmarks.landmark
+        torso_visibility = sum(landmarks[i].visibility for i in self.ROI_TORSO_IDS) / len(self.ROI_TORSO_IDS)
+        if torso_visibility < self.roi_min_visibility:
+            return False
+
+        # A body running off a crop edge means the crop is too tight, unless
+        # that edge is also the frame edge
+        height, width = frame_shape[:2]
+        x0, y0, x1, y1 = self.roi
+        min_x = 0.02 if x0 > 0 else -1.0
+        max_x = 0.98 if x1 < width else 2.0
+        min_y = 0.02 if y0 > 0 else -1.0
+        max_y = 0.98 if y1 < height else 2.0
+        for lm in landmarks:
+            if lm.visibility >= 0.5 and not (min_x < lm.x < max_x and min_y < lm.y < max_y):
+                return False
+        return True
+
+    def _update_roi(self, results, frame_shape):
+        if not results.pose_landmarks:
+            self.roi = None
+            return
+
+        height, width = frame_shape[:2]
+        xs = [lm.x for lm in results.pose_landmarks.landmark]
+        ys = [lm.y for lm in results.pose_landmarks.landmark]
+        bx0, bx1 = min(xs) * width, max(xs) * width
+        by0, by1 = min(ys) * height, max(ys) * height
+
+        if self.roi is not None:
+            # Keep the crop still while the body stays well inside it; a moving
+            # crop shifts the coordinates MediaPipe tracks in from frame to frame
+            x0, y0, x1, y1 = self.roi
+            margin_x = 0.5 * self.roi_padding * (bx1 - bx0)
+            margin_y = 0.5 * self.roi_padding * (by1 - by0)
+            inside = (bx0 - margin_x >= x0 and bx1 + margin_x <= x1 and
+                      by0 - margin_y >= y0 and by1 + margin_y <= y1)
+            not_oversized = (x1 - x0) * (y1 - y0) <= 3 * (bx1 - bx0 + 1) * (by1 - by0 + 1)
+            if inside and not_oversized:
+                return
+
+        pad_x = self.roi_padding * (bx1 - bx0)
+        pad_y = self.roi_padding * (by1 - by0)
+        x0 = max(0, int(bx0 - pad_x))
+        y0 = max(0, int(by0 - pad_y))
+        x1 = min(width, int(bx1 + pad_x))
+        y1 = min(height, int(by1 + pad_y))
+        self.roi = (x0, y0, x1, y1) if x1 - x0 > 16 and y1 - y0 > 16 else None
 
     def draw_landmarks(self, frame, results):
         if results.pose_landmarks:
@@ -39,6 +344,14 @@ class PoseDetector:
             )
         return frame
 
+    def draw_people(self, frame, people):
+        """
+        Draws every person of a (P, 33, 4) landmark array.
+        """
+        for landmarks in people:
+            self.draw_landmarks(frame, landmarks_to_results(landmarks))
+        return frame
+
     def get_named_landmarks(self, results):
         if not results.pose_landmarks:
             return {}
@@ -60,3 +373,72 @@ class PoseDetector:
         for lm in results.pose_landmarks.landmark:
             landmarks.append((lm.x, lm.y, lm.z, lm.visibility))
         return landmarks
+
+    def get_landmarks_array(self, results, out=None):
+        """
+        Fills a (33, 4) float32 array of (x, y, z, visibility) and returns it,
+        or None when no pose was found. Without `out` the detector's own buffer
+        is reused, so the array is overwritten by the next call; copy it to keep it.
+        """
+        if not results.pose_landmarks:
+            return None
+        if out is None:
+            out = self._landmark_buffer()
+
+        landmarks_array = getattr(results, "landmarks_array", None)
+        if landmarks_array is not None:
+            np.copyto(out, landmarks_array)
+            return out
+
+        for idx, lm in enumerate(results.pose_landmarks.landmark):
+            out[idx, 0] = lm.x
+            out[idx, 1] = lm.y
+            out[idx, 2] = lm.z
+            out[idx, 3] = lm.visibility
+        return out
+
+    def get_people_array(self, results):
+        """
+        Returns a (P, 33, 4) array with everyone in the results. Single-pose
+        backends give at most one row.
+        """
+        people = getattr(results, "people", None)
+        if people is not None:
+            return people
+        landmarks = self.get_landmarks_array(results)
+        if landmarks is None:
+            return np.zeros((0, NUM_LANDMARKS, 4), dtype=np.float32)
+        return landmarks[None]
+
+    def get_landmarks_view(self, results):
+        landmarks = self.get_landmarks_array(results)
+        return LandmarkView(landmarks) if landmarks is not None else None
+
+    def _rgb_buffer(self, frame):
+        buffer = self.__dict__.get("_rgb_out")
+        if buffer is None or buffer.shape != frame.shape:
+            buffer = self._rgb_out = np.empty_like(frame)
+        return buffer
+
+    def _landmark_buffer(self):
+        buffer = self.__dict__.get("_landmarks_out")
+        if buffer is None:
+            buffer = self._landmarks_out = np.zeros((NUM_LANDMARKS, 4), dtype=np.float32)
+        return buffer
+
+    def reset(self):
+        """
+        Drops the tracked pose so the next frame starts a fresh detection.
+        """
+        for graph in self._graphs.values():
+            graph.reset()
+        self.roi = None
+        self.model_complexity = self.default_complexity
+        self.pose = self._graph(self.default_complexity)
+        self._frames_since_switch = 0
+        self._previous_xy = None
+
+    def close(self):
+        for graph in self._graphs.values():
+            graph.close()
+        self._graphs.clear()
@@ -1,6 +1,4 @@
-import cv2
 import time
-import numpy as np
 import threading
 import streamlit as st
 import mediapipe as mp
@@ -11,7 +9,20 @@ from scipy.signal import savgol_filter
 from scipy.spatial.distance import cosine
 from gtts import gTTS
 from playsound import playsound
-from backend.pose_detection.mediapipe_model import PoseDetector
+from backend.pose_detection.detector_pool import (
+    acquire_pose_detector,
+    release_pose_detector,
+    acquire_face_mesh,
+    release_face_mesh
+)
+from backend.pose_detection.frame_source import open_frame_source
+from backend.pose_detection.capture_profile import CaptureProfile
+from backend.pose_detection.frame_scheduler import FrameScheduler
+from backend.pose_detection.motion_gate import MotionGate
+from backend.pose_detection.frame_buffers import FrameBuffers, AllocationCounter
+from backend.pose_detection.eye_state import EyeStateEstimator
+from backend.feedback_engine.pose_normalization import PoseNormalizer, normalize_pose
+from backend.feedback_engine.reference_store import MEDITATION_FILE, load_reference
 
 class VoiceFeedbackManager:
     def _init_(self, interval=6):
@@ -49,14 +60,19 @@ class VoiceFeedbackManager:
 
 voice_manager = VoiceFeedbackManager()
 try:
-    reference_pose = np.load("reference_meditation_pose.npz")['mean_pose']
+    reference_pose = load_reference("meditation", "meditation", MEDITATION_FILE)
+    # Compared in canonical form: hip-centered, torso-scaled x, y, z without visibility
+    reference_canonical = normalize_pose(reference_pose.reshape(33, 4))[:, :3].ravel()
 except:
     reference_pose = None
     print("❌ Reference meditation pose file not found. Run the extractor script first.")
 
 SIMILARITY_THRESHOLD = 0.75
+# In torso lengths; equal to the former 0.05 / 0.03 image-unit limits at the reference distance
+HEAD_OFFSET_LIMIT = 0.08
+SHOULDER_TILT_LIMIT = 0.05
 
-def run_meditation_session(duration_minutes):   
+def run_meditation_session(duration_minutes, source=0, realtime=True):   
     if "meditation_running" not in st.session_state:
         st.session_state["meditation_running"] = True
     if "alert_shown" not in st.session_state:
@@ -84,14 +100,16 @@ def run_meditation_session(duration_minutes):
     duration = duration_minutes * 60
     start_time = time.time()
 
-    cap = cv2.VideoCapture(0)
+    cap = open_frame_source(source, profile=CaptureProfile.for_pose_detector(), realtime=realtime)
     if not cap.isOpened():
         st.error("❌ Could not access webcam.")
         return
 
-    detector = PoseDetector()
+    detector = acquire_pose_detector()
     mp_draw = mp.solutions.drawing_utils
-    face_mesh = mp.solutions.face_mesh.FaceMesh(refine_landmarks=True)
+    face_mesh = acquire_face_mesh(refine=False)
+    refined_face_mesh = acquire_face_mesh()
+    eye_state = EyeStateEstimator(face_mesh, refined_face_mesh)
     mp_pose = mp.solutions.pose
 
     chest_movements = []
@@ -99,20 +117,41 @@ def run_meditation_session(duration_minutes):
     usable_frames = head_issues = shoulder_issues = incorrect_posture = 0
     last_feedback = {"breathing": 0, "eyes": 0, "posture": 0, "head": 0, "shoulders": 0}
     breathing_scores = []
+    active_fps = 20 if cap.realtime else None
+    scheduler = FrameScheduler(target_fps=active_fps)
+    detector.set_frame_budget(scheduler.budget)
+    # Breathing is read from chest landmarks, so even a still scene is re-analyzed a few times a second
+    gate = MotionGate(refresh_interval=0.25)
+    results = landmarks = None
+    normalizer = PoseNormalizer()
+    pose_key = None
+    buffers = FrameBuffers()
+    allocations = AllocationCounter()
 
     try:
         while time.time() - start_time < duration and st.session_state.meditation_running:
-            ret, frame = cap.read()
+            scheduler.begin_frame()
+            allocations.begin_frame()
+            ret, frame, captured_at, dropped = cap.read()
             if not ret:
                 st.error("Failed to read from camera")
                 break
 
-            frame = cv2.flip(frame, 1)
-            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = detector.detect_pose(frame)
-            face_results = face_mesh.process(rgb)
+            buffers.mirror(frame)
+            # Still scene: keep the previous pose and face results
+            analyzed = gate.should_analyze(frame, captured_at)
+            if analyzed:
+                # One RGB conversion shared by both models
+                rgb = buffers.to_rgb(frame)
+                results = detector.detect_pose(frame, rgb=rgb)
+                landmarks = detector.get_landmarks_array(results)
+                pose_key = captured_at
+                # FaceMesh on the face crop, at the eye-check rate
+                eye_state.update(rgb, landmarks, captured_at)
+                gate.record(landmarks is not None, captured_at)
+                if active_fps:
+                    scheduler.set_target_fps(gate.idle_fps if gate.idle else active_fps)
             mp_draw.draw_landmarks(frame, results.pose_landmarks, mp_pose.POSE_CONNECTIONS)
-            landmarks = detector.get_landmarks(results)
             total_frames += 1
 
             eyes_closed = False
@@ -122,17 +161,8 @@ def run_meditation_session(duration_minutes):
             now = time.time()
             breathing_check_allowed = False
 
-            if face_results.multi_face_landmarks:
-                face_lms = face_results.multi_face_landmarks[0].landmark
-                def get_ear(eye):
-                    A = np.linalg.norm(np.array([eye[1].x, eye[1].y]) - np.array([eye[5].x, eye[5].y]))
-                    B = np.linalg.norm(np.array([eye[2].x, eye[2].y]) - np.array([eye[4].x, eye[4].y]))
-                    C = np.linalg.norm(np.array([eye[0].x, eye[0].y]) - np.array([eye[3].x, eye[3].y]))
-                    return (A + B) / (2.0 * C)
-                left_eye = [face_lms[i] for i in [362, 385, 387, 263, 373, 380]]
-                right_eye = [face_lms[i] for i in [33, 160, 158, 133, 153, 144]]
-                ear = (get_ear(left_eye) + get_ear(right_eye)) / 2.0
-                if ear > 0.25:
+            if eye_state.ear is not None:
+                if eye_state.eyes_open:
                     eyes_open += 1
                     if now - last_feedback["eyes"] > 6:
                         voice_manager.speak("eyes", "Please close your eyes to begin meditation.")
@@ -140,20 +170,20 @@ def run_meditation_session(duration_minutes):
                 else:
                     eyes_closed = True
 
-            if landmarks and reference_pose is not None:
-                flat = np.array(landmarks).flatten()
-                sim = 1 - cosine(flat, reference_pose)
+            if landmarks is not None and reference_pose is not None:
+                canonical = normalizer.update(landmarks, pose_key)
+                sim = 1 - cosine(canonical[:, :3].ravel(), reference_canonical)
                 if sim < SIMILARITY_THRESHOLD:
                     posture_correct = False
                 else:
                     posture_correct = True
 
-                left_shoulder, right_shoulder = landmarks[11], landmarks[12]
-                nose = landmarks[0]
+                left_shoulder, right_shoulder = canonical[11], canonical[12]
+                nose = canonical[0]
                 mid_shoulder_x = (left_shoulder[0] + right_shoulder[0]) / 2
-                if abs(nose[0] - mid_shoulder_x) > 0.05:
+                if abs(nose[0] - mid_shoulder_x) > HEAD_OFFSET_LIMIT:
                     head_aligned = False
-                if abs(left_shoulder[1] - right_shoulder[1]) > 0.03:
+                if abs(left_shoulder[1] - right_shoulder[1]) > SHOULDER_TILT_LIMIT:
                     shoulders_level = False
 
                 if not posture_correct and now - last_feedback["posture"] > 6:
@@ -180,14 +210,15 @@ def run_meditation_session(duration_minutes):
                     feedback_box.markdown("### ⏳ Waiting for correct posture and eyes closed to begin.")
                     st.session_state.alert_shown = True
                 stframe.image(frame, channels="BGR", use_container_width=True)
-                time.sleep(0.05)
+                allocations.end_frame()
+                scheduler.end_frame()
                 continue
 
             if st.session_state.alert_shown:
                 feedback_box.markdown("")
                 st.session_state.alert_shown = False
 
-            if landmarks and len(landmarks) > 24:
+            if landmarks is not None and analyzed:
                 left_shoulder, right_shoulder = landmarks[11], landmarks[12]
                 chest_y = (left_shoulder[1] + right_shoulder[1]) / 2
                 chest_movements.append(chest_y)
@@ -195,7 +226,8 @@ def run_meditation_session(duration_minutes):
                 if len(chest_movements) > 30:
                     smoothed = savgol_filter(chest_movements[-30:], 11, 3)
                     motion_range = max(smoothed) - min(smoothed)
-                    chart_box.line_chart(smoothed, height=100)
+                    if scheduler.should_run("breathing_chart"):
+                        chart_box.line_chart(smoothed, height=100)
 
                     feedback = ""
                     if motion_range < 0.001:
@@ -218,7 +250,7 @@ def run_meditation_session(duration_minutes):
                     if feedback:
                         feedback_box.markdown(f"### 💬 {feedback}")
 
-            if usable_frames > 0:
+            if usable_frames > 0 and scheduler.should_run("live_metrics"):
                 pose_accuracy = 100 - (incorrect_posture / usable_frames * 100)
                 head_ratio = 100 - (head_issues / usable_frames * 100)
                 shoulder_ratio = 100 - (shoulder_issues / usable_frames * 100)
@@ -232,16 +264,24 @@ def run_meditation_session(duration_minutes):
                 - 💪 Shoulder Balance: {shoulder_ratio:.1f}%
                 - 🫁 Breathing Score: {breath_score}
                 """)
+                if allocations.enabled:
+                    metrics_placeholder.caption(f"Allocated per frame: {allocations.last_bytes / 1024:.1f} KB")
 
             stframe.image(frame, channels="BGR", use_container_width=True)
-            time.sleep(0.05)
+            allocations.end_frame()
+            scheduler.end_frame()
 
 
 
     finally:
     # Ensure resources are released properly
         cap.release()
-        face_mesh.close()
+        release_pose_detector(detector)
+        release_face_mesh(face_mesh, refine=False)
+        release_face_mesh(refined_face_mesh)
+        if allocations.enabled:
+            print(f"[Meditation] {allocations.average_bytes / 1024:.1f} KB allocated per frame over {allocations.frames} frames")
+            allocations.stop()
         st.session_state.meditation_running = False
         st.session_state.alert_shown = False
         st.session_state.show_summary = True
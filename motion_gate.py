@@ -0,0 +1,80 @@
+# backend/pose_detection/motion_gate.py
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """
+    Cheap check that runs before pose inference. A tiny grayscale copy of the
+    frame is compared with the last analyzed one; while the scene is still, the
+    caller can keep using the previous landmarks instead of running the models.
+    A refresh is forced every `refresh_interval` seconds regardless.
+
+    When nobody has been in frame for `idle_after` seconds the gate reports
+    `idle`, and loops drop to `idle_fps` until something moves again.
+    """
+
+    def __init__(self, size=(64, 48), threshold=3.0, refresh_interval=1.0, idle_after=5.0, idle_fps=2):
+        self.size = size
+        self.threshold = threshold
+        self.refresh_interval = refresh_interval
+        self.idle_after = idle_after
+        self.idle_fps = idle_fps
+
+        width, height = size
+        self._small = np.zeros((height, width, 3), dtype=np.uint8)
+        self._gray = np.zeros((height, width), dtype=np.uint8)
+        self._reference = np.zeros((height, width), dtype=np.uint8)
+        self._diff = np.zeros((height, width), dtype=np.uint8)
+        self._has_reference = False
+        self._last_analyzed = None
+        self._last_person_seen = None
+        self.motion = 0.0
+        self.idle = False
+        self.skipped_frames = 0
+
+    def should_analyze(self, frame, timestamp, commit=True):
+        """
+        Returns True when the frame differs enough from the last analyzed one,
+        or the refresh interval has passed; the frame then becomes the new reference.
+        With commit=False the reference is left alone until mark_analyzed() is
+        called, for callers that may still decide not to run the analysis.
+        """
+        cv2.resize(frame, self.size, dst=self._small, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+
+        if self._has_reference:
+            cv2.absdiff(self._gray, self._reference, dst=self._diff)
+            self.motion = float(self._diff.mean())
+        else:
+            self.motion = float("inf")
+
+        due = self._last_analyzed is None or timestamp - self._last_analyzed >= self.refresh_interval
+        if self.motion < self.threshold and not due:
+            self.skipped_frames += 1
+            return False
+
+        if self.motion >= self.threshold:
+            self.idle = False
+        if commit:
+            self.mark_analyzed(timestamp)
+        return True
+
+    def mark_analyzed(self, timestamp):
+        """
+        Makes the frame last passed to should_analyze() the new reference.
+        """
+        np.copyto(self._reference, self._gray)
+        self._has_reference = True
+        self._last_analyzed = timestamp
+
+    def record(self, person_present, timestamp):
+        """
+        Reports whether the analysis that was just run found anyone.
+        """
+        if person_present or self._last_person_seen is None:
+            self._last_person_seen = timestamp
+            self.idle = False
+        elif timestamp - self._last_person_seen >= self.idle_after:
+            self.idle = True
@@ -0,0 +1,101 @@
+# backend/feedback_engine/motion_phase.py
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+class PhaseReference:
+    """
+    Reference angle curves (N frames, K labelled angles) with per-phase
+    tolerance bands precomputed: lower/upper[i] are the min/max of each
+    angle within `window` frames of phase i, widened by `margin` degrees.
+    Checking a live frame is then an O(1) lookup at its phase.
+    """
+
+    def __init__(self, curves, labels, window=5, margin=15):
+        self.curves = np.asarray(curves, dtype=np.float32).reshape(-1, len(labels))
+        self.labels = list(labels)
+        if len(self.curves):
+            padded = np.pad(self.curves, ((window, window), (0, 0)), mode="edge")
+            neighbourhood = sliding_window_view(padded, 2 * window + 1, axis=0)
+            self.lower = np.nanmin(neighbourhood, axis=-1) - margin
+            self.upper = np.nanmax(neighbourhood, axis=-1) + margin
+        else:
+            self.lower = self.upper = self.curves
+
+    def __len__(self):
+        return len(self.curves)
+
+    @classmethod
+    def from_records(cls, records, labels, **kwargs):
+        """
+        From an angle reference as loaded by load_reference: AngleRecords or
+        the legacy list of {label: angle} dicts. Missing angles are NaN.
+        """
+        if hasattr(records, "column"):
+            curves = np.stack([records.column(label) if label in records.columns
+                               else np.full(len(records), np.nan, dtype=np.float32) for label in labels], axis=1)
+        else:
+            curves = [[record.get(label, np.nan) for label in labels] for record in records]
+        return cls(curves, labels, **kwargs)
+
+    def out_of_band(self, phase, angles):
+        """
+        (K,) bool, True where a live angle is outside the band at `phase`.
+        NaN angles or bands are never flagged.
+        """
+        angles = np.asarray(angles, dtype=np.float32)
+        return (angles < self.lower[phase]) | (angles > self.upper[phase])
+
+
+class PhaseEstimator:
+    """
+    Maps each live frame to its position in the reference movement: the
+    nearest reference frame by mean absolute angle difference, searched only
+    from `max_backtrack` frames behind to `max_advance` frames ahead of the
+    previous phase, so the phase moves forward through the cycle and does not
+    jump between similar-looking frames of different parts of the movement.
+    The reference is treated as cyclic. When the nearest candidate is more
+    than `relock_distance` degrees off, the whole reference is searched again.
+    """
+
+    def __init__(self, reference, max_advance=4, max_backtrack=1, relock_distance=25):
+        self.reference = reference
+        self.steps = np.arange(-max_backtrack, max_advance + 1)
+        self.relock_distance = relock_distance
+        self.phase = None
+        self.distance = np.inf
+
+    def _nearest(self, candidates, angles):
+        diff = np.abs(self.reference.curves[candidates] - angles)
+        count = np.count_nonzero(~np.isnan(diff), axis=1)
+        # Frames sharing no angle with the live pose are never chosen
+        distance = np.where(count > 0, np.nansum(diff, axis=1) / np.maximum(count, 1), np.inf)
+        best = int(np.argmin(distance))
+        return int(candidates[best]), float(distance[best])
+
+    def update(self, angles):
+        """
+        Returns the phase (reference frame index) of the live angles, or None
+        when the reference is empty.
+        """
+        size = len(self.reference)
+        if not size:
+            return None
+        angles = np.asarray(angles, dtype=np.float32)
+        if self.phase is not None:
+            phase, distance = self._nearest((self.phase + self.steps) % size, angles)
+            if distance <= self.relock_distance:
+                self.phase, self.distance = phase, distance
+                return phase
+        self.phase, self.distance = self._nearest(np.arange(size), angles)
+        return self.phase
+
+    def out_of_band(self, angles):
+        if self.phase is None:
+            return np.zeros(len(self.reference.labels), dtype=bool)
+        return self.reference.out_of_band(self.phase, angles)
+
+    def reset(self):
+        self.phase = None
+        self.distance = np.inf
@@ -1,14 +1,21 @@
 import numpy as np
 import os
 
+from backend.feedback_engine.reference_store import load_reference
+from backend.feedback_engine.pose_normalization import normalize_pose
+from backend.feedback_engine.angles import joint_angles
+from backend.feedback_engine.pose_comparator import ANGLE_TRIPLETS
+
 def load_motion_reference(path):
     """
-    Load saved motion sequence from .npz file.
+    Load saved motion sequence, from the compiled reference store when it
+    has it, otherwise from its .npz file.
     """
-    if not os.path.exists(path):
+    name = os.path.basename(path)[:-len("_motion.npz")]
+    try:
+        return load_reference("motion", name, path)
+    except FileNotFoundError:
         return None
-    data = np.load(path)
-    return data['landmarks']
 
 def compute_motion_similarity(live_seq, ref_seq):
     """
@@ -39,3 +46,265 @@ def compute_motion_similarity(live_seq, ref_seq):
     avg_diff = np.mean(diffs)
     normalized = max(0, 100 - avg_diff * 2)
     return normalized
+
+# Body joints (face excluded) compared frame to frame
+MOTION_JOINTS = np.arange(11, 33)
+# Cost for 0% similarity and the relock threshold when matching in angle space (RMS degrees)
+ANGLE_COST_SCALE = 40.0
+ANGLE_RELOCK_COST = 25.0
+
+# Angles a compact motion reference keeps: the important angles plus both ankles
+MOTION_ANGLE_TRIPLETS = np.concatenate([ANGLE_TRIPLETS, [(25, 27, 31), (26, 28, 32)]])
+# PCA dimensions the reference tooling keeps; 0 stores the plain angle curves
+MOTION_COMPONENTS = int(os.environ.get("AITHLETIQUE_MOTION_COMPONENTS", "4"))
+
+def motion_depth(landmarks):
+    """
+    Hip height of each frame of a clip (F, 33, D), 0 at the top of the
+    movement and 1 at the bottom.
+    """
+    hip_y = np.asarray(landmarks)[:, [23, 24], 1].mean(axis=1)
+    return ((hip_y - hip_y.min()) / max(np.ptp(hip_y), 1e-6)).astype(np.float32)
+
+class CompactMotionReference:
+    """
+    A motion reference in joint-angle space: per frame, the angles of
+    MOTION_ANGLE_TRIPLETS instead of 33 landmarks, optionally PCA-reduced
+    with the mean and basis stored alongside, plus the per-frame depth used
+    for rep counting. A live frame is projected once and compared with every
+    reference frame in that small space. Costs are RMS angle differences in
+    degrees; with PCA the part of the live frame outside the basis is added
+    back, so a pose unlike the reference is not made to look close.
+    """
+
+    def __init__(self, frames, triplets, mean, basis=None, depth=None):
+        self.frames = np.asarray(frames, dtype=np.float32)
+        self.triplets = np.asarray(triplets).reshape(-1, 3)
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.basis = None if basis is None else np.asarray(basis, dtype=np.float32)
+        self.depth = None if depth is None else np.asarray(depth, dtype=np.float32)
+        # Key angles are the ones that actually move in this reference (e.g. knees and hips for a squat)
+        spread = self.angles_at(np.arange(len(self.frames))).std(axis=0) if len(self.frames) else np.zeros(len(self.triplets))
+        self.key_angles = spread >= 0.25 * spread.max() if spread.size else spread.astype(bool)
+
+    def __len__(self):
+        return len(self.frames)
+
+    @property
+    def dimensions(self):
+        return self.frames.shape[1]
+
+    def project(self, angles):
+        """
+        Fully valid live angles (K,) into the reference space; returns
+        (point, residual).
+        """
+        centered = np.asarray(angles, dtype=np.float32) - self.mean
+        if self.basis is None:
+            return centered + self.mean, 0.0
+        point = centered @ self.basis
+        return point, float(np.linalg.norm(centered - self.basis @ point))
+
+    def angles_at(self, rows):
+        """
+        Reference angles (len(rows), K), reconstructed from the PCA space if needed.
+        """
+        if self.basis is None:
+            return self.frames[rows]
+        return self.mean + self.frames[rows] @ self.basis.T
+
+    def local_cost(self, landmarks, rows, min_visibility=0.5):
+        """
+        RMS angle difference in degrees between a live frame and the
+        reference frames `rows`, over the angles whose joints are visible.
+        None when fewer than half of the key angles are visible, since the
+        frame then says too little about the movement.
+        """
+        angles = joint_angles(landmarks, self.triplets, min_visibility=min_visibility)
+        valid = ~np.isnan(angles)
+        if 2 * np.count_nonzero(valid & self.key_angles) < np.count_nonzero(self.key_angles):
+            return None
+        if valid.all():
+            # Every angle known: compare in the reduced space directly
+            point, residual = self.project(angles)
+            distance = np.sqrt(np.square(self.frames[rows] - point).sum(axis=1) + residual ** 2)
+            return distance / np.sqrt(len(self.triplets))
+        # Hidden joints must not count as a match, so compare only the valid angles
+        diff = self.angles_at(rows)[:, valid] - angles[valid]
+        return np.sqrt(np.square(diff).mean(axis=1))
+
+    def save(self, path):
+        arrays = {"frames": self.frames, "triplets": self.triplets, "mean": self.mean}
+        if self.basis is not None:
+            arrays["basis"] = self.basis
+        if self.depth is not None:
+            arrays["depth"] = self.depth
+        np.savez(path, **arrays)
+
+def compress_motion_reference(landmarks, components=None, triplets=MOTION_ANGLE_TRIPLETS):
+    """
+    CompactMotionReference of a landmark clip (F, 33, 4). With `components`,
+    the angle curves are PCA-reduced to that many dimensions.
+    """
+    landmarks = np.asarray(landmarks, dtype=np.float32).reshape(-1, 33, 4)
+    curves = joint_angles(landmarks, triplets)
+    mean = np.nanmean(curves, axis=0)
+    frames, basis = np.where(np.isnan(curves), mean, curves), None
+    if components:
+        centered = frames - mean
+        _, _, vt = np.linalg.svd(centered, full_matrices=False)
+        basis = vt[:components].T
+        frames = centered @ basis
+    return CompactMotionReference(frames, triplets, mean, basis, motion_depth(landmarks))
+
+def compact_motion_path(path):
+    """
+    Where the compact form of a *_motion.npz reference is written.
+    """
+    return path[:-len(".npz")] + "_angles.npz"
+
+def save_compact_motion_reference(path, landmarks, components=MOTION_COMPONENTS):
+    """
+    Writes the compact form of the landmark reference saved at `path` next to it.
+    """
+    compact = compress_motion_reference(landmarks, components=components or None)
+    compact.save(compact_motion_path(path))
+    return compact
+
+def load_compact_motion_reference(path):
+    """
+    The compact form of the *_motion.npz reference at `path`, or None when the
+    tooling has not produced one or it is older than the landmark reference it
+    was made from.
+    """
+    compact_path = compact_motion_path(path)
+    if not os.path.exists(compact_path):
+        return None
+    if os.path.exists(path) and os.path.getmtime(path) > os.path.getmtime(compact_path):
+        print(f"[MotionReference] {compact_path} is older than {path}, using the landmark reference")
+        return None
+    data = np.load(compact_path)
+    return CompactMotionReference(
+        data["frames"], data["triplets"], data["mean"],
+        data["basis"] if "basis" in data else None,
+        data["depth"]
+    )
+
+def motion_features(landmarks):
+    """
+    Canonical x, y of the body joints for one frame (33, D) or a clip
+    (F, 33, D), so the local cost is in torso lengths.
+    """
+    return normalize_pose(landmarks)[..., MOTION_JOINTS, :2]
+
+class StreamingDTW:
+    """
+    Incremental subsequence DTW of the live stream against a whole reference
+    trajectory (e.g. all of squat_motion.npz).
+
+    Each update() adds one live frame. The live frame may align to the same
+    reference frame as before or advance it by up to `max_step` frames, so
+    the match follows the user's tempo. Older frames fade out with a horizon
+    of about `window` frames, and the match may start anywhere in the
+    reference. Once locked, only reference frames within `band` of the
+    current phase are updated (Sakoe-Chiba band), so a frame costs O(band)
+    and is vectorized over the band. A full pass relocks when the alignment
+    degrades or the phase reaches the end of the reference.
+
+    The reference is either a landmark clip, compared as canonical body-joint
+    positions, or a CompactMotionReference, compared in its angle space.
+
+    After update(): similarity (0-100), phase (index of the best-aligned
+    reference frame), progress (phase as a fraction of the reference) and
+    cost along the alignment (mean joint distance in torso lengths, or RMS
+    angle difference in degrees for a compact reference).
+    """
+
+    def __init__(self, reference, band=20, max_step=3, window=15, cost_scale=None, relock_cost=None,
+                 min_visibility=0.5):
+        if isinstance(reference, CompactMotionReference):
+            self.compact = reference
+            self.reference = reference.frames
+            default_scale, default_relock = ANGLE_COST_SCALE, ANGLE_RELOCK_COST
+        else:
+            self.compact = None
+            self.reference = motion_features(np.asarray(reference, dtype=np.float32).reshape(-1, 33, 4))
+            default_scale, default_relock = 0.5, 0.3
+        cost_scale = default_scale if cost_scale is None else cost_scale
+        relock_cost = default_relock if relock_cost is None else relock_cost
+        self.band = band
+        self.max_step = max_step
+        self.decay = 1.0 - 1.0 / window
+        self.cost_scale = cost_scale
+        self.relock_cost = relock_cost
+        self.min_visibility = min_visibility
+        self.reset()
+
+    def __len__(self):
+        return len(self.reference)
+
+    def reset(self):
+        size = len(self.reference)
+        self.D = np.full(size, np.inf)
+        self.L = np.zeros(size)
+        self._active = np.arange(0)
+        self.locked = False
+        self.similarity = 0.0
+        self.phase = None
+        self.progress = 0.0
+        self.cost = np.inf
+
+    def _window(self):
+        if not self.locked:
+            return np.arange(len(self.reference))
+        return np.arange(max(self.phase - self.band, 0), min(self.phase + self.band + 1, len(self.reference)))
+
+    def update(self, landmarks):
+        landmarks = np.asarray(landmarks, dtype=np.float32)
+        visible = landmarks[MOTION_JOINTS, 3] >= self.min_visibility
+        if not visible.any():
+            return self.similarity
+
+        idx = self._window()
+        # Local cost against every reference frame in the window at once
+        if self.compact is not None:
+            local = self.compact.local_cost(landmarks, idx, self.min_visibility)
+            if local is None:
+                return self.similarity
+        else:
+            live = motion_features(landmarks)
+            local = np.linalg.norm(self.reference[idx][:, visible] - live[visible], axis=-1).mean(axis=1)
+
+        # Predecessors: the same reference frame or up to max_step frames back
+        steps = idx[None, :] - np.arange(self.max_step + 1)[:, None]
+        prev_D = np.where(steps >= 0, self.D[np.maximum(steps, 0)], np.inf)
+        best = np.argmin(prev_D, axis=0)
+        prev_D = prev_D[best, np.arange(len(idx))]
+        prev_L = self.L[np.maximum(steps[best, np.arange(len(idx))], 0)]
+        # No finite predecessor: a match starts here
+        fresh = ~np.isfinite(prev_D)
+        prev_D = np.where(fresh, 0.0, prev_D)
+        prev_L = np.where(fresh, 0.0, prev_L)
+
+        D = local + self.decay * prev_D
+        L = 1.0 + self.decay * prev_L
+
+        self.D[self._active] = np.inf
+        self.D[idx] = D
+        self.L[idx] = L
+        self._active = idx
+
+        normalized = D / L
+        k = int(np.argmin(normalized))
+        self.phase = int(idx[k])
+        self.progress = self.phase / max(len(self.reference) - 1, 1)
+        self.cost = float(normalized[k])
+        self.similarity = max(0.0, 100.0 * (1.0 - self.cost / self.cost_scale))
+
+        at_end = self.phase + self.max_step >= len(self.reference)
+        self.locked = self.cost <= self.relock_cost and not at_end
+        if not self.locked:
+            # Next frame searches the whole reference again from scratch
+            self.D[idx] = np.inf
+            self._active = np.arange(0)
+        return self.similarity
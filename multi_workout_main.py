@@ -7,29 +7,67 @@ import cv2
 import numpy as np
 import streamlit as st
 import time
-from backend.pose_detection.mediapipe_model import PoseDetector
+from backend.pose_detection.detector_pool import acquire_pose_detector, release_pose_detector
+from backend.pose_detection.mediapipe_model import create_pose_detector
+from backend.pose_detection.person_tracker import PersonTracker
+from backend.pose_detection.frame_source import open_frame_source
+from backend.pose_detection.capture_profile import CaptureProfile
+from backend.pose_detection.frame_scheduler import FrameScheduler
+from backend.pose_detection.landmark_filter import OneEuroFilter, track_landmarks
 from backend.feedback_engine.workout_feedback import WorkoutFeedback
 from backend.feedback_engine.workout_rep_counter import WorkoutRepCounter
 from backend.feedback_engine.pose_similarity_checker import compare_pose
-from backend.feedback_engine.angles import calculate_angle_from_landmarks
+from backend.feedback_engine.angles import joint_angles
+from backend.feedback_engine.frame_features import FrameFeatures
+from backend.feedback_engine.reference_store import load_reference
+from backend.feedback_engine.motion_phase import PhaseReference, PhaseEstimator
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
 
-def run_workout(exercise_name, joint_indices, thresholds):
+FEEDBACK_RULES = {
+    "pushup": {
+        "elbow": (11, 13, 15),
+        "back": (11, 23, 24)
+    },
+    "plank": {
+        "shoulder_hip_knee": (11, 23, 25),
+        "back": (11, 23, 24)
+    },
+    "pullup": {
+        "elbow_shoulder_hip": (13, 11, 23),
+        "back": (11, 23, 24)
+    }
+}
+
+def angle_table(exercise_name, joint_indices):
+    """
+    Returns (rule_labels, triplets): row 0 of triplets is the rep-counting
+    joint and row i + 1 the form rule rule_labels[i].
+    """
+    rules = FEEDBACK_RULES.get(exercise_name, {})
+    rule_labels = list(rules)
+    return rule_labels, np.array([joint_indices] + [rules[label] for label in rule_labels])
+
+def run_workout(exercise_name, joint_indices, thresholds, source=0, realtime=True, max_people=1):
+    if max_people > 1:
+        run_group_workout(exercise_name, joint_indices, thresholds, max_people=max_people, source=source, realtime=realtime)
+        return
+
     stframe = st.empty()
     rep_placeholder = st.empty()
     similarity_placeholder = st.empty()
     message_placeholder = st.empty()
 
-    cap = cv2.VideoCapture(0)
+    cap = open_frame_source(source, profile=CaptureProfile.for_pose_detector(), realtime=realtime)
     if not cap.isOpened():
         st.error("Unable to access the camera.")
         return
+    if cap.granted:
+        logging.info(f"Camera granted: {cap.granted}")
 
     stop_button = st.button("🛑 Stop Workout")
 
-    model = PoseDetector()
     feedback = WorkoutFeedback()
     rep_counter = WorkoutRepCounter(exercise_name, threshold_down=thresholds['down'], threshold_up=thresholds['up'])
 
@@ -37,12 +75,15 @@ def run_workout(exercise_name, joint_indices, thresholds):
     angle_reference_path = f"pose_references/{exercise_name}_angles_reference.npy"
 
     try:
-        reference_pose = np.load(reference_pose_path)
-        angle_reference_data = np.load(angle_reference_path, allow_pickle=True)
+        reference_pose = load_reference("static", exercise_name, reference_pose_path)
+        angle_reference_data = load_reference("angles", exercise_name, angle_reference_path)
     except FileNotFoundError as e:
         st.error(f"Missing reference file: {e}")
+        cap.release()
         return
 
+    model = acquire_pose_detector()
+
     reps = 0
     similarity = 0.0
     smooth_similarity = []
@@ -50,132 +91,257 @@ def run_workout(exercise_name, joint_indices, thresholds):
     last_feedback_time = 0
     cooldown = 3.0
     visibility_threshold = 0.5
-    frame_index = 0
-
-    feedback_rules = {
-        "pushup": {
-            "elbow": (11, 13, 15),
-            "back": (11, 23, 24)
-        },
-        "plank": {
-            "shoulder_hip_knee": (11, 23, 25),
-            "back": (11, 23, 24)
-        },
-        "pullup": {
-            "elbow_shoulder_hip": (13, 11, 23),
-            "back": (11, 23, 24)
-        }
-    }
+    scheduler = FrameScheduler(target_fps=30 if cap.realtime else None)
+    model.set_frame_budget(scheduler.budget)
+    landmark_filter = OneEuroFilter()
+    rule_labels, triplets = angle_table(exercise_name, joint_indices)
+    phase_reference = PhaseReference.from_records(angle_reference_data, rule_labels)
+    phase_estimator = PhaseEstimator(phase_reference)
 
-    def check_angles(landmarks, ref_angles):
-        for label, (a, b, c) in feedback_rules.get(exercise_name, {}).items():
-            current_angle = calculate_angle_from_landmarks(landmarks, a, b, c)
-            reference_angle = ref_angles.get(label, None)
-            if reference_angle is not None and abs(current_angle - reference_angle) > 15:
-                logging.debug(f"Angle deviation detected: {label}, Current: {current_angle}, Reference: {reference_angle}")
+    def check_angles(rule_angles):
+        for i, off in enumerate(phase_estimator.out_of_band(rule_angles)):
+            if off:
+                label = rule_labels[i]
+                band = (phase_reference.lower[phase_estimator.phase, i], phase_reference.upper[phase_estimator.phase, i])
+                logging.debug(f"Angle deviation detected: {label}, Current: {rule_angles[i]}, Band: {band}")
                 feedback.give_feedback(f"Adjust your {label.replace('_', ' ')}")
 
-    while cap.isOpened():
-        if stop_button:
-            break
+    try:
+        while cap.isOpened():
+            if stop_button:
+                break
 
-        ret, frame = cap.read()
-        if not ret:
-            break
+            scheduler.begin_frame()
+            ret, frame, captured_at, dropped = cap.read()
+            if not ret:
+                break
 
-        results = model.detect_pose(frame)
-        landmarks_full = model.get_landmarks(results)
+            results, landmarks_full = track_landmarks(
+                model, landmark_filter, frame, captured_at,
+                detect=scheduler.should_run("pose_detection")
+            )
 
-        if not landmarks_full or any(lm[3] < visibility_threshold for lm in landmarks_full):
-            similarity = 0.0
-            if time.time() - last_feedback_time > cooldown:
-                feedback.give_feedback("pose not fully visible")
-                last_feedback_time = time.time()
-            message_placeholder.markdown("<span style='color:red'><b>⚠️ Pose not fully visible</b></span>", unsafe_allow_html=True)
-            stframe.image(frame, channels="BGR")
-            rep_placeholder.markdown(f"### 🏋️ Repetitions: **{reps}**")
-            similarity_placeholder.progress(0, text=f"🎯 Accuracy: --")
-            time.sleep(0.02)
-            continue
-
-        landmarks = [lm[:3] for lm in landmarks_full]
-        flat_landmarks = np.array(landmarks).flatten()
-
-        avg_z = np.mean([lm[2] for lm in landmarks_full])
-        if exercise_name in ["pushup", "plank"] and avg_z > -0.2:
-            similarity = 0.0
-            if time.time() - last_feedback_time > cooldown:
-                feedback.give_feedback(f"get into {exercise_name} position")
-                last_feedback_time = time.time()
-            message_placeholder.markdown(f"<span style='color:red'><b>⚠️ Get into {exercise_name} position</b></span>", unsafe_allow_html=True)
+            features = FrameFeatures(landmarks_full) if landmarks_full is not None else None
+            if features is None or not features.visible(visibility_threshold).all():
+                similarity = 0.0
+                if time.time() - last_feedback_time > cooldown:
+                    feedback.give_feedback("pose not fully visible")
+                    last_feedback_time = time.time()
+                message_placeholder.markdown("<span style='color:red'><b>⚠️ Pose not fully visible</b></span>", unsafe_allow_html=True)
+                stframe.image(frame, channels="BGR")
+                rep_placeholder.markdown(f"### 🏋️ Repetitions: **{reps}**")
+                similarity_placeholder.progress(0, text=f"🎯 Accuracy: --")
+                scheduler.end_frame()
+                continue
+
+            flat_landmarks = landmarks_full[:, :3].ravel()
+
+            avg_z = landmarks_full[:, 2].mean()
+            if exercise_name in ["pushup", "plank"] and avg_z > -0.2:
+                similarity = 0.0
+                if time.time() - last_feedback_time > cooldown:
+                    feedback.give_feedback(f"get into {exercise_name} position")
+                    last_feedback_time = time.time()
+                message_placeholder.markdown(f"<span style='color:red'><b>⚠️ Get into {exercise_name} position</b></span>", unsafe_allow_html=True)
+                stframe.image(frame, channels="BGR")
+                rep_placeholder.markdown(f"### 🏋️ Repetitions: **{reps}**")
+                similarity_placeholder.progress(0, text=f"🎯 Accuracy: --")
+                scheduler.end_frame()
+                continue
+
+            angles = features.angles(triplets)
+            angle = angles[0]
+            if rule_labels:
+                phase_estimator.update(angles[1:])
+            deep_position = angle < thresholds['down']
+
+            if deep_position:
+                similarity_now, is_correct = compare_pose(flat_landmarks, reference_pose, threshold=0.92)
+                smooth_similarity.append(similarity_now)
+                if len(smooth_similarity) > 5:
+                    smooth_similarity.pop(0)
+                similarity = np.mean(smooth_similarity)
+
+                if time.time() - last_feedback_time > cooldown and phase_estimator.phase is not None:
+                    check_angles(angles[1:])
+                    last_feedback_time = time.time()
+            else:
+                similarity = 0.0
+                smooth_similarity.clear()
+
+            if rep_counter.update(angle):
+                reps += 1
+                if smooth_similarity:
+                    similarity_scores.append(np.mean(smooth_similarity))
+                    avg_angle_accuracy = similarity_scores[-1]
+                    if avg_angle_accuracy < 0.85:
+                        feedback.give_feedback("Try to improve your form")
+                smooth_similarity.clear()
+
+            frame = model.draw_landmarks(frame, results)
             stframe.image(frame, channels="BGR")
-            rep_placeholder.markdown(f"### 🏋️ Repetitions: **{reps}**")
-            similarity_placeholder.progress(0, text=f"🎯 Accuracy: --")
-            time.sleep(0.02)
-            continue
-
-        angle = calculate_angle_from_landmarks(landmarks_full, *joint_indices)
-        deep_position = angle < thresholds['down']
-
-        if deep_position:
-            similarity_now, is_correct = compare_pose(flat_landmarks, reference_pose, threshold=0.92)
-            smooth_similarity.append(similarity_now)
-            if len(smooth_similarity) > 5:
-                smooth_similarity.pop(0)
-            similarity = np.mean(smooth_similarity)
-
-            if time.time() - last_feedback_time > cooldown and frame_index < len(angle_reference_data):
-                ref_angles = angle_reference_data[frame_index]
-                check_angles(landmarks_full, ref_angles)
-                last_feedback_time = time.time()
-        else:
-            similarity = 0.0
-            smooth_similarity.clear()
-
-        if rep_counter.update(angle):
-            reps += 1
-            if smooth_similarity:
-                similarity_scores.append(np.mean(smooth_similarity))
-                avg_angle_accuracy = similarity_scores[-1]
-                if avg_angle_accuracy < 0.85:
-                    feedback.give_feedback("Try to improve your form")
-            smooth_similarity.clear()
-
-        frame = model.draw_landmarks(frame, results)
-        stframe.image(frame, channels="BGR")
-        rep_placeholder.markdown(f"### 🏋️ Repetitions: **{reps}**")
-        similarity_placeholder.progress(int(similarity * 100), text=f"🎯 Accuracy: {similarity * 100:.1f}%")
-        frame_index += 1
-        time.sleep(0.02)
-
-    cap.release()
+            if scheduler.should_run("widgets"):
+                rep_placeholder.markdown(f"### 🏋️ Repetitions: **{reps}**")
+                similarity_placeholder.progress(int(similarity * 100), text=f"🎯 Accuracy: {similarity * 100:.1f}%")
+            scheduler.end_frame()
+    finally:
+        cap.release()
+        release_pose_detector(model)
+
     st.success("Workout session ended.")
     st.markdown("---")
     st.markdown(f"## 🧾 {exercise_name.capitalize()} Session Summary")
     st.markdown(f"**Total Repetitions:** {reps}")
+    st.markdown(f"**Average FPS:** {scheduler.achieved_fps:.1f}")
     if similarity_scores:
         st.markdown(f"**Best Accuracy:** {max(similarity_scores) * 100:.1f}%")
         st.markdown(f"**Average Accuracy:** {np.mean(similarity_scores) * 100:.1f}%")
     else:
         st.markdown("**Accuracy Data:** No valid reps captured")
 
-def start_pushup_workout():
+def run_group_workout(exercise_name, joint_indices, thresholds, max_people=4, source=0, realtime=True):
+    """
+    Group class variant of run_workout: everyone in view is tracked with their
+    own rep counter and feedback state, and the angles and form rules of all
+    people are evaluated in one batched (persons, 33, 4) computation. When
+    the Tasks model for multi-person tracking is missing, one person is
+    tracked with the regular pose detector instead.
+    """
+    stframe = st.empty()
+    rep_placeholder = st.empty()
+
+    cap = open_frame_source(source, profile=CaptureProfile.for_pose_detector(), realtime=realtime)
+    if not cap.isOpened():
+        st.error("Unable to access the camera.")
+        return
+
+    stop_button = st.button("🛑 Stop Workout")
+
+    angle_reference_path = f"pose_references/{exercise_name}_angles_reference.npy"
+    try:
+        angle_reference_data = load_reference("angles", exercise_name, angle_reference_path)
+    except FileNotFoundError as e:
+        st.error(f"Missing reference file: {e}")
+        cap.release()
+        return
+
+    try:
+        model = create_pose_detector(num_poses=max_people)
+    except (FileNotFoundError, RuntimeError) as e:
+        # Without the Tasks model only one person can be tracked; keep the session going with them
+        logging.warning(f"Group tracking unavailable, tracking one person: {e}")
+        st.warning(f"⚠️ Group tracking is unavailable, so only one person will be tracked. {e}")
+        model = create_pose_detector()
+
+    rule_labels, triplets = angle_table(exercise_name, joint_indices)
+    phase_reference = PhaseReference.from_records(angle_reference_data, rule_labels)
+    tracker = PersonTracker(state_factory=lambda: {
+        "rep_counter": WorkoutRepCounter(exercise_name, threshold_down=thresholds['down'], threshold_up=thresholds['up']),
+        "reps": 0,
+        "message": "",
+        "last_feedback_time": 0.0,
+        "phase": PhaseEstimator(phase_reference)
+    })
+    reps_by_person = {}
+    cooldown = 3.0
+    visibility_threshold = 0.5
+    scheduler = FrameScheduler(target_fps=30 if cap.realtime else None)
+
+    try:
+        while cap.isOpened():
+            if stop_button:
+                break
+
+            scheduler.begin_frame()
+            ret, frame, captured_at, dropped = cap.read()
+            if not ret:
+                break
+
+            results = model.detect_pose(frame)
+            people = model.get_people_array(results)
+            persons = tracker.update(people, captured_at)
+
+            if len(people):
+                angles = joint_angles(people, triplets)
+                visible = (people[:, :, 3] >= visibility_threshold).all(axis=1)
+                deep = angles[:, 0] < thresholds['down']
+
+                off = np.zeros((len(people), len(rule_labels)), dtype=bool)
+                if rule_labels and len(phase_reference):
+                    # Each person has their own phase in the movement; the band check is a lookup at it
+                    for row, person in enumerate(persons):
+                        person.state["phase"].update(angles[row, 1:])
+                        off[row] = person.state["phase"].out_of_band(angles[row, 1:])
+                    off &= (deep & visible)[:, None]
+
+                now = time.time()
+                for person, angle, is_visible, person_off in zip(persons, angles[:, 0], visible, off):
+                    state = person.state
+                    if not is_visible:
+                        state["message"] = "not fully visible"
+                        continue
+                    if state["rep_counter"].update(angle):
+                        state["reps"] += 1
+                        reps_by_person[person.track_id] = state["reps"]
+                    if now - state["last_feedback_time"] > cooldown:
+                        state["message"] = ""
+                        if person_off.any():
+                            label = rule_labels[int(np.argmax(person_off))]
+                            state["message"] = f"adjust your {label.replace('_', ' ')}"
+                            state["last_feedback_time"] = now
+
+                model.draw_people(frame, people)
+                height, width = frame.shape[:2]
+                for person in persons:
+                    x0, y0 = person.box[:2]
+                    origin = (int(x0 * width), max(20, int(y0 * height) - 10))
+                    label = f"#{person.track_id}: {person.state['reps']} {person.state['message']}"
+                    cv2.putText(frame, label, origin, cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+
+            stframe.image(frame, channels="BGR")
+            if scheduler.should_run("widgets"):
+                standings = " | ".join(f"#{track.track_id}: **{track.state['reps']}**" for track in tracker.tracks)
+                rep_placeholder.markdown(f"### 🏋️ Repetitions: {standings or '--'}")
+            scheduler.end_frame()
+    finally:
+        cap.release()
+        model.close()
+
+    st.success("Workout session ended.")
+    st.markdown("---")
+    st.markdown(f"## 🧾 {exercise_name.capitalize()} Group Session Summary")
+    for track_id, person_reps in sorted(reps_by_person.items()):
+        st.markdown(f"**Person #{track_id}:** {person_reps} repetitions")
+    if not reps_by_person:
+        st.markdown("**Repetitions:** No reps captured")
+    st.markdown(f"**Average FPS:** {scheduler.achieved_fps:.1f}")
+
+def start_pushup_workout(source=0, realtime=True, max_people=1):
     run_workout(
         exercise_name="pushup",
         joint_indices=(11, 13, 15),
-        thresholds={"down": 70, "up": 160, "back": (160, 195, (11, 23, 24))}
+        thresholds={"down": 70, "up": 160, "back": (160, 195, (11, 23, 24))},
+        source=source,
+        realtime=realtime,
+        max_people=max_people
     )
 
-def start_plank_workout():
+def start_plank_workout(source=0, realtime=True, max_people=1):
     run_workout(
         exercise_name="plank",
         joint_indices=(11, 23, 25),
-        thresholds={"down": 160, "up": 170, "back": (160, 195, (11, 23, 24))}
+        thresholds={"down": 160, "up": 170, "back": (160, 195, (11, 23, 24))},
+        source=source,
+        realtime=realtime,
+        max_people=max_people
     )
 
-def start_pullup_workout():
+def start_pullup_workout(source=0, realtime=True, max_people=1):
     run_workout(
         exercise_name="pullup",
         joint_indices=(13, 11, 23),
-        thresholds={"down": 80, "up": 150, "back": (160, 195, (11, 23, 24))}
+        thresholds={"down": 80, "up": 150, "back": (160, 195, (11, 23, 24))},
+        source=source,
+        realtime=realtime,
+        max_people=max_people
     )
@@ -0,0 +1,123 @@
+# backend/pose_detection/person_tracker.py
+
+import numpy as np
+
+
+class TrackedPerson:
+    """
+    One person followed across frames. `state` holds whatever the session
+    keeps per person (rep counter, feedback timers, ...), created by the
+    tracker's state_factory when the person first appears.
+    """
+
+    def __init__(self, track_id, landmarks, box, timestamp, state=None):
+        self.track_id = track_id
+        self.landmarks = landmarks.copy()
+        self.box = box
+        self.last_seen = timestamp
+        self.missing = 0
+        self.state = state if state is not None else {}
+
+
+class PersonTracker:
+    """
+    Lightweight ID tracker for multi-pose detection. Each frame's (P, 33, 4)
+    detections are matched to existing tracks on a cost mixing bounding box
+    IoU and mean landmark distance; pairs are accepted greedily from the
+    cheapest up. Unmatched detections start new tracks and tracks missing for
+    more than max_missing frames are dropped.
+    """
+
+    def __init__(self, state_factory=dict, iou_weight=0.5, max_distance=0.2, max_cost=0.7,
+                 max_missing=15, min_visibility=0.5):
+        self.state_factory = state_factory
+        self.iou_weight = iou_weight
+        self.max_distance = max_distance  # landmark distance (normalized) that counts as no overlap
+        self.max_cost = max_cost
+        self.max_missing = max_missing
+        self.min_visibility = min_visibility
+        self.tracks = []
+        self._next_id = 1
+
+    def _boxes(self, landmarks, visible):
+        # (P, 4) x0, y0, x1, y1 over the visible landmarks of each person
+        xy = landmarks[..., :2]
+        low = np.where(visible[..., None], xy, np.inf).min(axis=-2)
+        high = np.where(visible[..., None], xy, -np.inf).max(axis=-2)
+        return np.concatenate([low, high], axis=-1)
+
+    @staticmethod
+    def _iou(boxes_a, boxes_b):
+        a = boxes_a[:, None, :]
+        b = boxes_b[None, :, :]
+        width = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+        height = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+        intersection = width * height
+        area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+        area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+        union = area_a + area_b - intersection
+        return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+    def _costs(self, track_landmarks, track_boxes, landmarks, boxes):
+        iou = self._iou(track_boxes, boxes)
+
+        # Mean distance over landmarks visible in both poses, (T, P)
+        both = (track_landmarks[:, None, :, 3] >= self.min_visibility) & (landmarks[None, :, :, 3] >= self.min_visibility)
+        distance = np.linalg.norm(track_landmarks[:, None, :, :2] - landmarks[None, :, :, :2], axis=-1)
+        counts = both.sum(axis=-1)
+        mean_distance = np.where(both, distance, 0).sum(axis=-1) / np.maximum(counts, 1)
+        mean_distance = np.where(counts > 0, mean_distance, self.max_distance)
+
+        distance_cost = np.minimum(mean_distance / self.max_distance, 1.0)
+        return self.iou_weight * (1 - iou) + (1 - self.iou_weight) * distance_cost
+
+    def update(self, landmarks, timestamp):
+        """
+        Matches a (P, 33, 4) array of detected people and returns the P
+        TrackedPerson objects in the same order as its rows.
+        """
+        landmarks = np.asarray(landmarks, dtype=np.float32)
+        visible = landmarks[..., 3] >= self.min_visibility
+        # People with nothing confidently visible still get a box from all landmarks
+        visible |= ~visible.any(axis=-1, keepdims=True)
+        boxes = self._boxes(landmarks, visible) if len(landmarks) else np.zeros((0, 4), dtype=np.float32)
+
+        assigned = [None] * len(landmarks)
+        matched_tracks = set()
+        if self.tracks and len(landmarks):
+            track_landmarks = np.stack([track.landmarks for track in self.tracks])
+            track_boxes = np.stack([track.box for track in self.tracks])
+            costs = self._costs(track_landmarks, track_boxes, landmarks, boxes)
+            for flat in np.argsort(costs, axis=None):
+                t, p = np.unravel_index(flat, costs.shape)
+                if costs[t, p] > self.max_cost:
+                    break
+                if t in matched_tracks or assigned[p] is not None:
+                    continue
+                matched_tracks.add(t)
+                track = self.tracks[t]
+                np.copyto(track.landmarks, landmarks[p])
+                track.box = boxes[p]
+                track.last_seen = timestamp
+                track.missing = 0
+                assigned[p] = track
+
+        survivors = []
+        for t, track in enumerate(self.tracks):
+            if t not in matched_tracks:
+                track.missing += 1
+            if track.missing <= self.max_missing:
+                survivors.append(track)
+        self.tracks = survivors
+
+        for p, track in enumerate(assigned):
+            if track is None:
+                track = TrackedPerson(self._next_id, landmarks[p], boxes[p], timestamp, self.state_factory())
+                self._next_id += 1
+                self.tracks.append(track)
+                assigned[p] = track
+        return assigned
+
+    def reset(self):
+        self.tracks = []
+        self._next_id = 1
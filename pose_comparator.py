@@ -1,5 +1,11 @@
+import os
 import numpy as np
 import math
+import random
+
+from backend.feedback_engine.angles import joint_angles, triplet_points, is_degenerate
+from backend.feedback_engine.frame_features import FrameFeatures, reads
+from backend.feedback_engine.reference_store import load_reference
 
 IMPORTANT_ANGLE_PAIRS = [
     (23, 25, 27),  # Right Hip-Knee-Ankle
@@ -12,19 +18,28 @@ IMPORTANT_ANGLE_PAIRS = [
     (24, 12, 14)   # Hip-Shoulder-Elbow Left
 ]
 
+ANGLE_TRIPLETS = np.array(IMPORTANT_ANGLE_PAIRS)
+
+# Angle i of a mirrored pose is angle FLIP_INDICES[i] of the original
+FLIP_INDICES = [1, 0, 3, 2, 5, 4, 7, 6]
+
 EXCLUDED_JOINTS = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10]  # Mostly face joints
 
 def calculate_angle(a, b, c):
-    a = np.array(a)
-    b = np.array(b)
-    c = np.array(c)
-    ab = a - b
-    cb = c - b
-    cosine_angle = np.dot(ab, cb) / (np.linalg.norm(ab) * np.linalg.norm(cb) + 1e-6)
-    angle = np.arccos(np.clip(cosine_angle, -1.0, 1.0))
-    return np.degrees(angle)
+    points, dims = triplet_points(a, b, c)
+    if is_degenerate(points):
+        # The epsilon in the old cosine formula made a zero-length side 90 degrees
+        return 90.0
+    return joint_angles(points, (0, 1, 2), dims=dims)[0]
 
+@reads("important_angles")
 def extract_important_angles_safe(landmarks_list):
+    if isinstance(landmarks_list, FrameFeatures):
+        return landmarks_list.important_angles
+    if len(landmarks_list) > ANGLE_TRIPLETS.max():
+        # Full landmark set: all eight 3D angles in one pass
+        return joint_angles(np.asarray(landmarks_list)[..., :3], ANGLE_TRIPLETS, dims=3)
+
     angles = []
     for (a, b, c) in IMPORTANT_ANGLE_PAIRS:
         if a < len(landmarks_list) and b < len(landmarks_list) and c < len(landmarks_list):
@@ -38,34 +53,58 @@ def extract_important_angles_safe(landmarks_list):
     return np.array(angles)
 
 def load_single_reference_landmarks(filepath):
-    data = np.load(filepath)
-    return data['landmarks']
+    # Served from the compiled reference store when it has this pose
+    name = os.path.splitext(os.path.basename(filepath))[0]
+    return load_reference("pose", name, filepath)
 
 def flip_left_right_angles(angles_array):
-    flip_indices = [1, 0, 3, 2, 5, 4, 7, 6]
-    flipped = angles_array.copy()
-    for i, j in enumerate(flip_indices):
-        flipped[i] = angles_array[j]
-    return flipped
+    return np.asarray(angles_array)[..., FLIP_INDICES]
+
+class ReferenceAngleIndex:
+    """
+    Important angles of every reference pose, computed once when the references
+    are loaded. Rows [0, N) hold the references and rows [N, 2N) their mirror
+    images, so comparing a live pose against all references in both
+    orientations is a single vectorized pass.
+    """
+
+    def __init__(self, reference_landmarks_list):
+        if isinstance(reference_landmarks_list, np.ndarray) and reference_landmarks_list.ndim == 2:
+            reference_landmarks_list = reference_landmarks_list[None]
+        angles = [extract_important_angles_safe(ref) for ref in reference_landmarks_list]
+        self.angles = np.array(angles, dtype=np.float64).reshape(-1, len(IMPORTANT_ANGLE_PAIRS))
+        # Mirroring the reference instead of the live pose gives the same mean difference
+        self.table = np.concatenate([self.angles, flip_left_right_angles(self.angles)])
+
+    def __len__(self):
+        return len(self.angles)
+
+    def best_match(self, live_landmarks):
+        """
+        Returns (accuracy, reference_id) of the closest reference, mirrored or
+        not. reference_id is None when the index is empty.
+        """
+        if not len(self.angles):
+            return 0, None
+        live_angles = extract_important_angles_safe(live_landmarks)
+        mean_diff = np.abs(self.table - live_angles).mean(axis=1)
+        best = int(np.argmin(mean_diff))
+        return max(0, 100 - mean_diff[best]), best % len(self.angles)
 
 def compute_pose_accuracy(live_landmarks, reference_landmarks_list):
-    live_angles = extract_important_angles_safe(live_landmarks)
-    live_flipped = flip_left_right_angles(live_angles)
-    best_score = 0
-    for ref_landmarks in reference_landmarks_list:
-        ref_angles = extract_important_angles_safe(ref_landmarks)
-        if live_angles.shape != ref_angles.shape:
-            continue
-        diff_normal = np.abs(live_angles - ref_angles)
-        accuracy_normal = max(0, 100 - np.mean(diff_normal))
-        diff_flipped = np.abs(live_flipped - ref_angles)
-        accuracy_flipped = max(0, 100 - np.mean(diff_flipped))
-        accuracy = max(accuracy_normal, accuracy_flipped)
-        if accuracy > best_score:
-            best_score = accuracy
-    return best_score
+    if not isinstance(reference_landmarks_list, ReferenceAngleIndex):
+        reference_landmarks_list = ReferenceAngleIndex(reference_landmarks_list)
+    return reference_landmarks_list.best_match(live_landmarks)[0]
 
+@reads("visible")
 def check_enough_landmarks(landmarks_list, required_ids=[11, 12, 13, 14, 15, 16, 23, 24, 25, 26, 27, 28, 31, 32]):
+    if isinstance(landmarks_list, FrameFeatures):
+        visible_count = np.count_nonzero(landmarks_list.visible(0.05)[required_ids])
+        return visible_count >= int(0.75 * len(required_ids))
+    if isinstance(landmarks_list, np.ndarray) and len(landmarks_list) > max(required_ids):
+        visible_count = np.count_nonzero(landmarks_list[required_ids, 3] >= 0.05)
+        return visible_count >= int(0.75 * len(required_ids))
+
     visible_count = 0
     for idx in required_ids:
         if idx < len(landmarks_list):
@@ -74,57 +113,111 @@ def check_enough_landmarks(landmarks_list, required_ids=[11, 12, 13, 14, 15, 16,
                 visible_count += 1
     return visible_count >= int(0.75 * len(required_ids))
 
+DIRECTION_TEMPLATES = [
+    "Move your {joint} slightly {dir}.",
+    "Adjust your {joint} a bit {dir}.",
+    "Shift your {joint} slightly {dir}.",
+    "Try moving your {joint} slightly {dir}.",
+    "Lift your {joint} a little {dir}."
+]
+
+JOINT_ANGLE_DESCRIPTIONS = [
+    ("right knee", "Bend your right knee a little more."),
+    ("left knee", "Bend your left knee a little more."),
+    ("right hip", "Open your right hip slightly."),
+    ("left hip", "Open your left hip slightly."),
+    ("right elbow", "Try straightening your right arm a bit."),
+    ("left elbow", "Try straightening your left arm a bit."),
+    ("right shoulder", "Relax your right shoulder and keep it aligned."),
+    ("left shoulder", "Relax your left shoulder and keep it aligned.")
+]
+
+class FeedbackCue:
+    """
+    One deviation from the reference. Directional cues have axis "x" or "y",
+    a direction ("up", "down", "left", "right") and a magnitude in normalized
+    units; angle cues have axis "angle", direction "+" / "-" and a magnitude
+    in degrees. The sentence is only built by render(), for the cue that is
+    actually shown or spoken.
+    """
+
+    def __init__(self, joint, name, axis, direction, magnitude):
+        self.joint = joint
+        self.name = name
+        self.axis = axis
+        self.direction = direction
+        self.magnitude = magnitude
+
+    @property
+    def key(self):
+        # Same correction regardless of wording
+        return (self.joint, self.axis, self.direction)
+
+    def render(self):
+        if self.axis == "angle":
+            return JOINT_ANGLE_DESCRIPTIONS[self.joint][1]
+        return random.choice(DIRECTION_TEMPLATES).format(joint=self.name, dir=self.direction)
+
+def _coordinates(landmarks):
+    if isinstance(landmarks, FrameFeatures):
+        return landmarks.landmarks
+    return landmarks
+
+@reads("landmarks")
+def rank_directional_deviations(user_landmarks, ref_landmarks, joint_names, threshold=0.01):
+    """
+    Every joint (face excluded) whose x or y is more than `threshold` away from
+    the reference, one cue per axis, largest deviation first.
+    """
+    user = np.asarray(_coordinates(user_landmarks), dtype=np.float64)
+    ref = np.asarray(_coordinates(ref_landmarks), dtype=np.float64)
+    joints = np.setdiff1d(np.arange(min(len(user), len(ref))), EXCLUDED_JOINTS)
+    delta = user[joints, :2] - ref[joints, :2]
+
+    rows, axes = np.nonzero(np.abs(delta) > threshold)
+    magnitudes = np.abs(delta[rows, axes])
+    cues = []
+    for k in np.argsort(-magnitudes, kind="stable"):
+        joint, axis, d = int(joints[rows[k]]), axes[k], delta[rows[k], axes[k]]
+        if axis == 1:
+            direction = "up" if d < 0 else "down"
+        else:
+            direction = "right" if d > 0 else "left"
+        cues.append(FeedbackCue(joint, joint_names.get(joint, f"joint {joint}"), "xy"[axis], direction, float(magnitudes[k])))
+    return cues
+
+@reads("important_angles")
+def rank_angle_deviations(user_landmarks, ref_landmarks, angle_threshold=20):
+    """
+    Important angles more than `angle_threshold` degrees off the reference,
+    largest deviation first.
+    """
+    angle_diffs = extract_important_angles_safe(user_landmarks) - extract_important_angles_safe(ref_landmarks)
+    magnitudes = np.abs(angle_diffs)
+    cues = []
+    for i in np.argsort(-magnitudes, kind="stable"):
+        if magnitudes[i] <= angle_threshold:
+            break
+        name = JOINT_ANGLE_DESCRIPTIONS[i][0]
+        cues.append(FeedbackCue(int(i), name, "angle", "+" if angle_diffs[i] > 0 else "-", float(magnitudes[i])))
+    return cues
+
+@reads("landmarks", "important_angles")
+def rank_feedback(user_landmarks, ref_landmarks, joint_names, threshold=0.01, angle_threshold=20):
+    """
+    Directional cues, then angle cues, each ranked by magnitude. The first
+    one is the cue to show.
+    """
+    return (rank_directional_deviations(user_landmarks, ref_landmarks, joint_names, threshold)
+            + rank_angle_deviations(user_landmarks, ref_landmarks, angle_threshold))
+
 def generate_directional_feedback(user_landmarks, ref_landmarks, joint_names, threshold=0.01):
-    import random
-    feedback = []
-    templates = [
-        "Move your {joint} slightly {dir}.",
-        "Adjust your {joint} a bit {dir}.",
-        "Shift your {joint} slightly {dir}.",
-        "Try moving your {joint} slightly {dir}.",
-        "Lift your {joint} a little {dir}."
-    ]
-    for i, (user, ref) in enumerate(zip(user_landmarks, ref_landmarks)):
-        if i in EXCLUDED_JOINTS:
-            continue
-        try:
-            ux, uy = float(user[0]), float(user[1])
-            rx, ry = float(ref[0]), float(ref[1])
-        except Exception:
-            continue
-        dx = ux - rx
-        dy = uy - ry
-        directions = []
-        if abs(dy) > threshold:
-            directions.append("up" if dy < 0 else "down")
-        if abs(dx) > threshold:
-            directions.append("right" if dx > 0 else "left")
-        if directions:
-            joint = joint_names.get(i, f"joint {i}")
-            for d in directions:
-                sentence = random.choice(templates).format(joint=joint, dir=d)
-                feedback.append(sentence)
-    return feedback
+    # Sentences of rank_directional_deviations, largest deviation first
+    return [cue.render() for cue in rank_directional_deviations(user_landmarks, ref_landmarks, joint_names, threshold)]
 
 def generate_advanced_feedback(user_landmarks, ref_landmarks, joint_names, angle_threshold=20):
-    feedback = []
-    user_angles = extract_important_angles_safe(user_landmarks)
-    ref_angles = extract_important_angles_safe(ref_landmarks)
-    angle_diffs = user_angles - ref_angles
-    joint_angle_descriptions = [
-        ("right knee", "Bend your right knee a little more."),
-        ("left knee", "Bend your left knee a little more."),
-        ("right hip", "Open your right hip slightly."),
-        ("left hip", "Open your left hip slightly."),
-        ("right elbow", "Try straightening your right arm a bit."),
-        ("left elbow", "Try straightening your left arm a bit."),
-        ("right shoulder", "Relax your right shoulder and keep it aligned."),
-        ("left shoulder", "Relax your left shoulder and keep it aligned.")
-    ]
-    for i, diff in enumerate(angle_diffs):
-        if abs(diff) > angle_threshold:
-            feedback.append(joint_angle_descriptions[i][1])
-    return feedback
+    # Sentences of rank_angle_deviations, largest deviation first
+    return [cue.render() for cue in rank_angle_deviations(user_landmarks, ref_landmarks, angle_threshold)]
 
 def generate_balance_feedback(user_landmarks, threshold=0.05):
     try:
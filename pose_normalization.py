@@ -0,0 +1,79 @@
+# backend/feedback_engine/pose_normalization.py
+
+import numpy as np
+
+LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_HIP, RIGHT_HIP = 11, 12, 23, 24
+# Joints used to fit the Procrustes rotation; the face is left out
+BODY_JOINTS = np.arange(11, 33)
+
+
+def normalize_pose(landmarks, out=None):
+    """
+    Canonical form of one pose (33, D) or many (..., 33, D): x, y, z are
+    centered on the mid-hip and divided by the torso length (mid-hip to
+    mid-shoulder in the image plane), so distances are in torso lengths and do
+    not depend on where the user stands or how far from the camera. Remaining
+    columns (visibility) are copied unchanged.
+    """
+    landmarks = np.asarray(landmarks, dtype=np.float32)
+    if out is None:
+        out = np.empty_like(landmarks)
+
+    hip = (landmarks[..., LEFT_HIP, :3] + landmarks[..., RIGHT_HIP, :3]) / 2
+    shoulder = (landmarks[..., LEFT_SHOULDER, :3] + landmarks[..., RIGHT_SHOULDER, :3]) / 2
+    torso = np.maximum(np.linalg.norm(shoulder[..., :2] - hip[..., :2], axis=-1), 1e-6)
+
+    np.subtract(landmarks[..., :3], hip[..., None, :], out=out[..., :3])
+    out[..., :3] /= torso[..., None, None]
+    out[..., 3:] = landmarks[..., 3:]
+    return out
+
+
+def procrustes_rotation(source, target, min_visibility=0.5):
+    """
+    2x2 rotation R (image plane) minimizing |R @ source - target| over the body
+    joints of two canonical poses, weighted by the joints visible in both.
+    Reflections are excluded, so a mirrored pose is not aligned away.
+    """
+    weights = np.minimum(source[BODY_JOINTS, 3], target[BODY_JOINTS, 3]) >= min_visibility
+    if weights.sum() < 3:
+        return np.eye(2, dtype=np.float32)
+    s = source[BODY_JOINTS, :2][weights]
+    t = target[BODY_JOINTS, :2][weights]
+    u, _, vt = np.linalg.svd(s.T @ t)
+    d = np.sign(np.linalg.det(vt.T @ u.T))
+    return (vt.T @ np.diag([1.0, d]) @ u.T).astype(np.float32)
+
+
+class PoseNormalizer:
+    """
+    Per-frame cache of the live pose's canonical form. update() normalizes at
+    most once per frame key (e.g. the capture timestamp) and every comparator
+    of that frame reads the same array. With align=True, aligned_to() also
+    rotates it onto a canonical reference (cached per reference for the
+    frame); alignment hides whole-body lean, so it is off by default.
+    """
+
+    def __init__(self, align=False):
+        self.align = align
+        self.canonical = np.zeros((33, 4), dtype=np.float32)
+        self._frame_key = None
+        self._aligned = {}
+
+    def update(self, landmarks, frame_key):
+        if frame_key != self._frame_key:
+            normalize_pose(landmarks, out=self.canonical)
+            self._frame_key = frame_key
+            self._aligned.clear()
+        return self.canonical
+
+    def aligned_to(self, reference_key, reference_canonical):
+        if not self.align:
+            return self.canonical
+        aligned = self._aligned.get(reference_key)
+        if aligned is None:
+            rotation = procrustes_rotation(self.canonical, reference_canonical)
+            aligned = self.canonical.copy()
+            aligned[:, :2] = self.canonical[:, :2] @ rotation.T
+            self._aligned[reference_key] = aligned
+        return aligned
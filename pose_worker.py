@@ -0,0 +1,159 @@
+# backend/pose_detection/pose_worker.py
+
+import multiprocessing as mp_proc
+import queue
+from multiprocessing import shared_memory
+
+import cv2
+import mediapipe as mp
+import numpy as np
+
+from backend.pose_detection.mediapipe_model import PoseDetector, PoseResults, landmarks_to_results
+
+
+class SharedFrameRing:
+    """
+    Fixed number of frame slots in one shared memory block. The session loop
+    copies frames into a slot and only the slot index crosses the process
+    boundary, so frames are never pickled.
+    """
+
+    def __init__(self, slots, frame_shape, name=None):
+        self.slots = slots
+        self.frame_shape = tuple(frame_shape)
+        size = slots * int(np.prod(self.frame_shape))
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size)
+        self.frames = np.ndarray((slots,) + self.frame_shape, dtype=np.uint8, buffer=self.shm.buf)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def write(self, slot, frame):
+        target = self.frames[slot]
+        if frame.shape == target.shape:
+            np.copyto(target, frame)
+        else:
+            # Landmarks are normalized, so resizing into the slot is harmless
+            cv2.resize(frame, (target.shape[1], target.shape[0]), dst=target, interpolation=cv2.INTER_AREA)
+
+    def close(self):
+        self.frames = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _run_pose_worker(ring_name, slots, frame_shape, requests, responses):
+    ring = SharedFrameRing(slots, frame_shape, name=ring_name)
+    detector = PoseDetector()
+    try:
+        while True:
+            request = requests.get()
+            if request is None:
+                break
+            if request == "reset":
+                detector.reset()
+                continue
+            seq, slot = request
+            results = detector.detect_pose(ring.frames[slot])
+            # put() pickles on a feeder thread later; the detector's buffer would be overwritten by then
+            landmarks = detector.get_landmarks_array(results)
+            responses.put((seq, None if landmarks is None else landmarks.copy()))
+    finally:
+        detector.close()
+        ring.close()
+
+
+class ProcessPoseDetector(PoseDetector):
+    """
+    PoseDetector that runs MediaPipe in a worker process, so inference can use
+    a second core and overlap with rule evaluation and rendering.
+
+    Frames go through a SharedFrameRing and landmarks come back as small
+    (33, 4) float32 arrays. With pipelined=True, detect_pose() submits the new
+    frame and returns the most recent finished result (normally the previous
+    frame's) instead of waiting; with pipelined=False it waits for its own frame.
+    """
+
+    def __init__(self, slots=3, frame_size=PoseDetector.FRAME_SIZE, pipelined=True, result_timeout=2.0):
+        self.mp_pose = mp.solutions.pose
+        self.mp_drawing = mp.solutions.drawing_utils
+        self.pipelined = pipelined
+        self.result_timeout = result_timeout
+
+        width, height = frame_size
+        self.ring = SharedFrameRing(slots, (height, width, 3))
+        ctx = mp_proc.get_context("spawn")
+        self.requests = ctx.Queue()
+        self.responses = ctx.Queue()
+        self.process = ctx.Process(
+            target=_run_pose_worker,
+            args=(self.ring.name, slots, self.ring.frame_shape, self.requests, self.responses),
+            daemon=True
+        )
+        self.process.start()
+
+        self._next_seq = 0
+        # seq -> ring slot of every frame the worker has not answered yet
+        self._pending = {}
+        self._latest = PoseResults()
+        self._latest_seq = -1
+
+    def submit(self, frame):
+        """
+        Queues a frame and returns its seq, or None when the frame was dropped
+        because every slot is still held by a stalled worker.
+        """
+        # Never hand out a slot the worker may still be reading
+        while len(self._pending) >= self.ring.slots:
+            if self._collect(block=True) is None:
+                return None
+        busy = set(self._pending.values())
+        slot = next(s for s in range(self.ring.slots) if s not in busy)
+        seq = self._next_seq
+        self._next_seq += 1
+        self.ring.write(slot, frame)
+        self.requests.put((seq, slot))
+        self._pending[seq] = slot
+        return seq
+
+    def _collect(self, block):
+        try:
+            seq, landmarks = self.responses.get(block=block, timeout=self.result_timeout if block else None)
+        except queue.Empty:
+            # A stalled worker keeps its slots: they stay busy until its replies arrive
+            return None
+        self._pending.pop(seq, None)
+        # Replies may overtake each other; an older frame never replaces a newer result
+        if seq > self._latest_seq:
+            self._latest_seq = seq
+            self._latest = landmarks_to_results(landmarks)
+        return seq
+
+    def detect_pose(self, frame, rgb=None):
+        # The worker converts the BGR slot itself; a caller-side RGB copy is not needed
+        seq = self.submit(frame)
+        if self.pipelined or seq is None:
+            while self._collect(block=False) is not None:
+                pass
+        else:
+            while seq in self._pending and self._collect(block=True) is not None:
+                pass
+        return self._latest
+
+    def reset(self):
+        while self._pending and self._collect(block=True) is not None:
+            pass
+        self._latest = PoseResults()
+        self._latest_seq = self._next_seq - 1
+        self.requests.put("reset")
+
+    def close(self):
+        if self.process.is_alive():
+            self.requests.put(None)
+            self.process.join(timeout=2.0)
+            if self.process.is_alive():
+                self.process.terminate()
+        self.ring.close()
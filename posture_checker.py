@@ -1,8 +1,21 @@
 # backend/feedback_engine/posture_checker.py
 
-from backend.feedback_engine.angles import calculate_angle, get_point_coords
+import numpy as np
+
+from backend.feedback_engine.angles import joint_angles
 from backend.feedback_engine.rules import check_joint_angle
 
+# Index of the synthetic point level with the right shoulder, straight below/above the right ear
+NECK_LEVEL = 33
+
+# Joint -> (a, b, c) landmark triplet, angle taken at b
+POSE_JOINTS = {
+    "squat": {"knee": (24, 26, 28), "back": (12, 24, 28)},
+    "pushup": {"elbow": (12, 14, 16), "back": (12, 24, 28)},
+    "meditation": {"neck": (NECK_LEVEL, 12, 8), "spine": (12, 24, 28)},
+    "tree_pose": {"knee": (24, 26, 28), "hip": (12, 24, 26)},
+}
+
 def check_posture(pose_name, landmarks, frame_width, frame_height):
     """
     Analyze posture by checking angles for a specific pose/exercise.
@@ -15,61 +28,18 @@ def check_posture(pose_name, landmarks, frame_width, frame_height):
     if not landmarks or len(landmarks) < 33:
         return ["Pose not fully visible. Step back or adjust camera."]
 
-    # Define common joints to check per pose
-    joint_angles = {}
-
-    # Squat
-    if pose_name == "squat":
-        hip = get_point_coords(landmarks, 24, frame_width, frame_height)
-        knee = get_point_coords(landmarks, 26, frame_width, frame_height)
-        ankle = get_point_coords(landmarks, 28, frame_width, frame_height)
-        if hip and knee and ankle:
-            joint_angles["knee"] = calculate_angle(hip, knee, ankle)
-
-        shoulder = get_point_coords(landmarks, 12, frame_width, frame_height)
-        if shoulder and hip and ankle:
-            joint_angles["back"] = calculate_angle(shoulder, hip, ankle)
-
-    # Pushup
-    elif pose_name == "pushup":
-        shoulder = get_point_coords(landmarks, 12, frame_width, frame_height)
-        elbow = get_point_coords(landmarks, 14, frame_width, frame_height)
-        wrist = get_point_coords(landmarks, 16, frame_width, frame_height)
-        if shoulder and elbow and wrist:
-            joint_angles["elbow"] = calculate_angle(shoulder, elbow, wrist)
-
-        hip = get_point_coords(landmarks, 24, frame_width, frame_height)
-        ankle = get_point_coords(landmarks, 28, frame_width, frame_height)
-        if shoulder and hip and ankle:
-            joint_angles["back"] = calculate_angle(shoulder, hip, ankle)
-
-    # Meditation
-    elif pose_name == "meditation":
-        shoulder = get_point_coords(landmarks, 12, frame_width, frame_height)
-        ear = get_point_coords(landmarks, 8, frame_width, frame_height)
-        if shoulder and ear:
-            joint_angles["neck"] = calculate_angle((ear[0], shoulder[1]), shoulder, ear)
-
-        hip = get_point_coords(landmarks, 24, frame_width, frame_height)
-        ankle = get_point_coords(landmarks, 28, frame_width, frame_height)
-        if shoulder and hip and ankle:
-            joint_angles["spine"] = calculate_angle(shoulder, hip, ankle)
-
-    # ✅ Tree Pose (fixed)
-    elif pose_name == "tree_pose":
-        shoulder = get_point_coords(landmarks, 12, frame_width, frame_height)
-        hip = get_point_coords(landmarks, 24, frame_width, frame_height)
-        knee = get_point_coords(landmarks, 26, frame_width, frame_height)
-        ankle = get_point_coords(landmarks, 28, frame_width, frame_height)
-
-        if hip and knee and ankle:
-            joint_angles["knee"] = calculate_angle(hip, knee, ankle)
-
-        if shoulder and hip and knee:
-            joint_angles["hip"] = calculate_angle(shoulder, hip, knee)
+    # All joints of the pose in one kernel call, measured in pixel space
+    joint_angles_by_name = {}
+    joints = POSE_JOINTS.get(pose_name)
+    if joints:
+        points = np.asarray(landmarks, dtype=np.float64)[:, :2]
+        if pose_name == "meditation":
+            points = np.vstack([points, (points[8, 0], points[12, 1])])
+        angles = joint_angles(points, list(joints.values()), scale=(frame_width, frame_height))
+        joint_angles_by_name = dict(zip(joints, angles))
 
     # Compare angles against rules
-    for joint, angle in joint_angles.items():
+    for joint, angle in joint_angles_by_name.items():
         valid, msg = check_joint_angle(pose_name, joint, angle)
         if not valid and msg:
             feedback_msgs.append(msg)
@@ -0,0 +1,128 @@
+# backend/feedback_engine/reference_library.py
+
+import os
+import pickle
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from backend.feedback_engine.angles import joint_angles
+from backend.feedback_engine.frame_features import FrameFeatures, reads
+from backend.feedback_engine.reference_store import load_reference
+from backend.feedback_engine.pose_comparator import ANGLE_TRIPLETS, FLIP_INDICES
+
+REFERENCE_FOLDER = "pose_references"
+LIBRARY_CACHE = os.path.join(REFERENCE_FOLDER, "reference_library.pkl")
+
+
+@reads("important_angles")
+def angle_features(landmarks):
+    """
+    Important angles of one pose (33, D) or many (N, 33, D), scaled to [0, 1].
+    """
+    if isinstance(landmarks, FrameFeatures):
+        return landmarks.important_angles / 180.0
+    landmarks = np.asarray(landmarks, dtype=np.float64)
+    return joint_angles(landmarks[..., :3], ANGLE_TRIPLETS, dims=3) / 180.0
+
+
+def _fingerprint(folder):
+    return {
+        name: os.path.getmtime(os.path.join(folder, name))
+        for name in sorted(os.listdir(folder)) if name.endswith(".npz")
+    }
+
+
+class ReferenceLibrary:
+    """
+    KD-tree over the angle features of every reference sample of every pose in
+    the library, plus their mirror images. The nearest neighbour under the L1
+    metric is exactly the reference compute_pose_accuracy would pick by brute
+    force, but a lookup costs O(log n) instead of one comparison per sample,
+    so it stays flat as poses and samples are added.
+
+    best_match() has the same (accuracy, reference_id) contract as
+    ReferenceAngleIndex; labels[reference_id] names the asana and
+    landmarks[reference_id] is the matched sample.
+    """
+
+    def __init__(self, landmarks, labels, fingerprint=None):
+        self.landmarks = np.asarray(landmarks, dtype=np.float32).reshape(-1, 33, 4)
+        self.labels = np.asarray(labels)
+        self.fingerprint = fingerprint or {}
+
+        features = angle_features(self.landmarks).reshape(-1, len(ANGLE_TRIPLETS))
+        # Rows [0, N) are the samples, rows [N, 2N) their mirror images
+        self.tree = cKDTree(np.concatenate([features, features[:, FLIP_INDICES]]))
+
+    def __len__(self):
+        return len(self.landmarks)
+
+    @property
+    def pose_names(self):
+        return sorted(set(self.labels.tolist()))
+
+    @classmethod
+    def build(cls, folder=REFERENCE_FOLDER):
+        landmarks, labels = [], []
+        for name in sorted(os.listdir(folder)):
+            if not name.endswith(".npz"):
+                continue
+            try:
+                samples = load_reference("pose", os.path.splitext(name)[0], os.path.join(folder, name))
+            except Exception as e:
+                print(f"[ReferenceLibrary] Skipping {name}: {e}")
+                continue
+            samples = np.asarray(samples).reshape(-1, 33, 4)
+            landmarks.append(samples)
+            labels.extend([os.path.splitext(name)[0]] * len(samples))
+        if not landmarks:
+            raise FileNotFoundError(f"No reference poses found in {folder}")
+        return cls(np.concatenate(landmarks), labels, _fingerprint(folder))
+
+    def save(self, path=LIBRARY_CACHE):
+        with open(path, "wb") as f:
+            pickle.dump(self, f)
+
+    def best_match(self, live_landmarks):
+        """
+        Returns (accuracy, reference_id) of the closest sample in the library.
+        """
+        distance, row = self.tree.query(angle_features(live_landmarks), k=1, p=1)
+        # L1 over 8 angles scaled by 1/180 -> mean absolute difference in degrees
+        accuracy = max(0, 100 - distance * 180.0 / len(ANGLE_TRIPLETS))
+        return accuracy, int(row) % len(self.landmarks)
+
+    def identify(self, live_landmarks, k=5):
+        """
+        Majority vote of the k nearest samples. Returns (pose_name, share of
+        the votes it got).
+        """
+        k = min(k, self.tree.n)
+        _, rows = self.tree.query(angle_features(live_landmarks), k=k, p=1)
+        votes = self.labels[np.atleast_1d(rows) % len(self.landmarks)]
+        names, counts = np.unique(votes, return_counts=True)
+        best = int(np.argmax(counts))
+        return str(names[best]), counts[best] / k
+
+
+def load_reference_library(folder=REFERENCE_FOLDER, cache_path=LIBRARY_CACHE):
+    """
+    Loads the persisted library, rebuilding and saving it when reference files
+    were added, removed or changed since it was built.
+    """
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, "rb") as f:
+                library = pickle.load(f)
+            if library.fingerprint == _fingerprint(folder):
+                return library
+        except Exception as e:
+            print(f"[ReferenceLibrary] Rebuilding cache: {e}")
+
+    library = ReferenceLibrary.build(folder)
+    try:
+        library.save(cache_path)
+    except OSError as e:
+        print(f"[ReferenceLibrary] Could not save {cache_path}: {e}")
+    return library
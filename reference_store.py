@@ -0,0 +1,191 @@
+# backend/feedback_engine/reference_store.py
+
+import json
+import os
+
+import numpy as np
+
+# The store is two files: <path>.f32 (every reference, float32, back to back) and <path>.json (the index)
+REFERENCE_STORE = os.environ.get("AITHLETIQUE_REFERENCE_STORE", "reference_store")
+
+POSE_FOLDER = "pose_references"
+MOTION_FOLDER = "motion_references"
+MEDITATION_FILE = "reference_meditation_pose.npz"
+
+# (kind, file suffix) in match order; "_angles_reference.npy" must be tried before "_reference.npy"
+SOURCE_SUFFIXES = [
+    ("angles", "_angles_reference.npy"),
+    ("static", "_reference.npy"),
+    ("pose", ".npz"),
+]
+
+
+def _load_legacy(kind, path):
+    """
+    Reads one reference in its original file format.
+    """
+    if kind == "angles":
+        return np.load(path, allow_pickle=True)
+    if kind == "static":
+        return np.load(path)
+    data = np.load(path, allow_pickle=True)
+    if kind == "meditation":
+        return data["mean_pose"]
+    return data["landmarks"]
+
+
+def _as_float32(kind, value):
+    """
+    (array, columns) of a legacy reference in store layout. Angle records
+    (a list of dicts) become an (N, K) table whose column names go in the index.
+    """
+    if kind == "angles":
+        columns = sorted({label for record in value for label in record})
+        table = np.array([[record.get(c, np.nan) for c in columns] for record in value], dtype=np.float32)
+        return table.reshape(len(value), len(columns)), columns
+    # Some older .npz files hold object arrays of per-sample lists
+    value = np.asarray(value.tolist() if value.dtype == object else value, dtype=np.float32)
+    if kind in ("pose", "motion"):
+        value = value.reshape(-1, 33, 4)
+    return value, None
+
+
+def _sources(pose_folder=POSE_FOLDER, motion_folder=MOTION_FOLDER, meditation_file=MEDITATION_FILE):
+    """
+    Yields (kind, name, path) for every legacy reference file on disk.
+    """
+    if os.path.isdir(pose_folder):
+        for file in sorted(os.listdir(pose_folder)):
+            for kind, suffix in SOURCE_SUFFIXES:
+                if file.endswith(suffix):
+                    yield kind, file[:-len(suffix)], os.path.join(pose_folder, file)
+                    break
+    if os.path.isdir(motion_folder):
+        for file in sorted(os.listdir(motion_folder)):
+            if file.endswith("_motion.npz"):
+                yield "motion", file[:-len("_motion.npz")], os.path.join(motion_folder, file)
+    if os.path.exists(meditation_file):
+        yield "meditation", "meditation", meditation_file
+
+
+def compile_reference_store(path=REFERENCE_STORE, **folders):
+    """
+    Packs every reference file into one contiguous float32 blob plus a JSON
+    index of kind, name, shape, offset (in floats) and source mtime per entry.
+    Both files are written next to each other and swapped in atomically.
+    Returns the index.
+    """
+    entries, offset = [], 0
+    with open(path + ".f32.tmp", "wb") as blob:
+        for kind, name, source in _sources(**folders):
+            try:
+                value, columns = _as_float32(kind, _load_legacy(kind, source))
+            except Exception as e:
+                print(f"[ReferenceStore] Skipping {source}: {e}")
+                continue
+            blob.write(np.ascontiguousarray(value).tobytes())
+            entry = {"kind": kind, "name": name, "shape": list(value.shape), "offset": offset,
+                     "source": source, "mtime": os.path.getmtime(source)}
+            if columns is not None:
+                entry["columns"] = columns
+            entries.append(entry)
+            offset += value.size
+
+    index = {"dtype": "float32", "size": offset, "entries": entries}
+    with open(path + ".json.tmp", "w") as f:
+        json.dump(index, f, indent=1)
+    os.replace(path + ".f32.tmp", path + ".f32")
+    os.replace(path + ".json.tmp", path + ".json")
+    return index
+
+
+class AngleRecords:
+    """
+    Read-only view of an angle reference table that indexes like the legacy
+    list of dicts: records[i].get("hip", 90).
+    """
+
+    def __init__(self, table, columns):
+        self.table = table
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.table)
+
+    def __getitem__(self, i):
+        return dict(zip(self.columns, self.table[i].tolist()))
+
+    def column(self, label):
+        return self.table[:, self.columns.index(label)]
+
+
+class ReferenceStore:
+    """
+    The compiled store, opened read-only with np.memmap. get() returns views
+    into the mapping, so lookups copy nothing and every process that opens
+    the store shares the same page cache.
+    """
+
+    def __init__(self, path=REFERENCE_STORE):
+        with open(path + ".json") as f:
+            self.index = json.load(f)
+        self.entries = {(e["kind"], e["name"]): e for e in self.index["entries"]}
+        size = self.index["size"]
+        self.data = np.memmap(path + ".f32", dtype=np.float32, mode="r", shape=(size,)) if size else np.zeros(0, np.float32)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def names(self, kind):
+        return [name for k, name in self.entries if k == kind]
+
+    def is_current(self, kind, name):
+        """
+        False when the source file changed after the store was compiled.
+        """
+        entry = self.entries[(kind, name)]
+        source = entry.get("source")
+        return not source or not os.path.exists(source) or os.path.getmtime(source) == entry["mtime"]
+
+    def get(self, kind, name):
+        entry = self.entries.get((kind, name))
+        if entry is None:
+            return None
+        shape = tuple(entry["shape"])
+        view = self.data[entry["offset"]:entry["offset"] + int(np.prod(shape))].reshape(shape)
+        if kind == "angles":
+            return AngleRecords(view, entry["columns"])
+        return view
+
+
+_open_stores = {}
+
+
+def open_reference_store(path=REFERENCE_STORE):
+    """
+    The process-wide ReferenceStore for `path`, or None when it has not been
+    compiled.
+    """
+    if path not in _open_stores:
+        try:
+            _open_stores[path] = ReferenceStore(path)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"[ReferenceStore] Could not open {path}: {e}")
+            return None
+    return _open_stores[path]
+
+
+def load_reference(kind, name, legacy_path=None, store_path=REFERENCE_STORE):
+    """
+    A reference from the compiled store, falling back to its original file
+    when the store is missing, lacks the entry or is older than the file.
+    Raises FileNotFoundError like np.load when neither has it.
+    """
+    store = open_reference_store(store_path)
+    if store is not None and (kind, name) in store and store.is_current(kind, name):
+        return store.get(kind, name)
+    if legacy_path:
+        return _load_legacy(kind, legacy_path)
+    raise FileNotFoundError(f"No {kind} reference '{name}' in {store_path} and no source file given")
@@ -1,6 +1,6 @@
 # backend/feedback_engine/rep_counter.py
 
-from backend.feedback_engine.angles import calculate_angle, get_point_coords
+from backend.feedback_engine.angles import joint_angles
 
 class RepCounter:
     def __init__(self):
@@ -11,12 +11,8 @@ class RepCounter:
         """
         Count squats by tracking knee angle motion.
         """
-        hip = get_point_coords(landmarks, 24, frame_width, frame_height)
-        knee = get_point_coords(landmarks, 26, frame_width, frame_height)
-        ankle = get_point_coords(landmarks, 28, frame_width, frame_height)
-
-        if hip and knee and ankle:
-            angle = calculate_angle(hip, knee, ankle)
+        if len(landmarks) > 28:
+            angle = joint_angles(landmarks, (24, 26, 28), scale=(frame_width, frame_height))[0]
 
             # Logic to detect motion stages
             if angle < 90:
@@ -31,12 +27,8 @@ class RepCounter:
         """
         Count pushups by tracking elbow angle motion.
         """
-        shoulder = get_point_coords(landmarks, 12, frame_width, frame_height)
-        elbow = get_point_coords(landmarks, 14, frame_width, frame_height)
-        wrist = get_point_coords(landmarks, 16, frame_width, frame_height)
-
-        if shoulder and elbow and wrist:
-            angle = calculate_angle(shoulder, elbow, wrist)
+        if len(landmarks) > 16:
+            angle = joint_angles(landmarks, (12, 14, 16), scale=(frame_width, frame_height))[0]
 
             if angle < 90:
                 self.stage = "down"
@@ -6,7 +6,7 @@ import os
 import cv2
 import numpy as np
 from backend.pose_detection.mediapipe_model import PoseDetector
-from backend.feedback_engine.angles import calculate_angle_from_landmarks
+from backend.feedback_engine.angles import joint_angles
 
 angle_joints = {
     "squat": {
@@ -52,10 +52,8 @@ for file in os.listdir(input_dir):
             if not landmarks:
                 continue
 
-            angles = {}
-            for label, (a, b, c) in angle_joints[name].items():
-                angle = calculate_angle_from_landmarks(landmarks, a, b, c)
-                angles[label] = angle
+            joints = angle_joints[name]
+            angles = dict(zip(joints, joint_angles(landmarks, list(joints.values()))))
 
             angle_records.append(angles)
 
@@ -2,9 +2,9 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-import cv2
 import numpy as np
 from backend.pose_detection.mediapipe_model import PoseDetector
+from backend.pose_detection.frame_source import VideoFileSource
 
 # ... rest of your script ...
 
@@ -28,18 +28,14 @@ for file in os.listdir(input_dir):
 
         print(f"⏳ Processing {file}...")
 
-        cap = cv2.VideoCapture(video_path)
         pose_vectors = []
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-            results = model.detect_pose(frame)
-            landmarks = model.get_landmarks(results)
-            if landmarks:
-                vector = np.array([lm[:3] for lm in landmarks]).flatten()
-                pose_vectors.append(vector)
-        cap.release()
+        with VideoFileSource(video_path, realtime=False) as source:
+            for frame in source:
+                results = model.detect_pose(frame)
+                landmarks = model.get_landmarks(results)
+                if landmarks:
+                    vector = np.array([lm[:3] for lm in landmarks]).flatten()
+                    pose_vectors.append(vector)
 
         if pose_vectors:
             avg_vector = np.mean(pose_vectors, axis=0)
@@ -5,7 +5,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import cv2
 import numpy as np
 from backend.pose_detection.mediapipe_model import PoseDetector
-from backend.feedback_engine.angles import calculate_angle_from_landmarks
+from backend.feedback_engine.angles import joint_angles
 
 # Define joints of interest for each workout
 angle_joints = {
@@ -48,10 +48,8 @@ for file in os.listdir(input_dir):
             if not landmarks:
                 continue
 
-            angles = {}
-            for label, (a, b, c) in angle_joints[name].items():
-                angle = calculate_angle_from_landmarks(landmarks, a, b, c)
-                angles[label] = angle
+            joints = angle_joints[name]
+            angles = dict(zip(joints, joint_angles(landmarks, list(joints.values()))))
 
             angle_records.append(angles)
 
@@ -3,6 +3,7 @@ import cv2
 import numpy as np
 import os
 from backend.pose_detection.mediapipe_model import PoseDetector
+from backend.feedback_engine.motion_tools import save_compact_motion_reference
 
 video_folder = "pose_videos"  # 📂 Make sure your video is here
 save_folder = "motion_references"
@@ -37,8 +38,11 @@ cap.release()
 
 if frames:
     pose_name = input("💾 Enter workout name (e.g., squat): ").strip().lower()
-    np.savez(os.path.join(save_folder, f"{pose_name}_motion.npz"), landmarks=frames)
+    save_path = os.path.join(save_folder, f"{pose_name}_motion.npz")
+    np.savez(save_path, landmarks=frames)
+    compact = save_compact_motion_reference(save_path, frames)
     print(f"✅ Saved motion reference for '{pose_name}' with {len(frames)} frames!")
+    print(f"✅ Saved compact angle-space reference ({compact.dimensions} dimensions per frame)")
 else:
     print("⚠️ No poses detected!")
 
@@ -0,0 +1,114 @@
+# backend/pose_detection/tasks_pose.py
+
+import os
+import threading
+import time
+
+import cv2
+import mediapipe as mp
+import numpy as np
+from mediapipe.tasks import python as mp_tasks
+from mediapipe.tasks.python import vision
+
+from backend.pose_detection.mediapipe_model import NUM_LANDMARKS, PoseDetector, PoseResults, landmarks_to_results
+
+# Model bundle from https://developers.google.com/mediapipe/solutions/vision/pose_landmarker
+POSE_TASK_MODEL = os.environ.get("AITHLETIQUE_POSE_TASK_MODEL", "models/pose_landmarker_full.task")
+
+
+class TasksPoseDetector(PoseDetector):
+    """
+    PoseDetector backed by the MediaPipe Tasks PoseLandmarker in LIVE_STREAM mode.
+
+    detect_pose() hands the frame to the landmarker with a timestamp and returns
+    straight away with the newest result delivered by the callback, which is
+    normally the previous frame's; the loop analyzes frame N while frame N+1 is
+    being inferred. With pipelined=False it waits for the frame's own result.
+    Results come back as the same PoseResults the other backends return; with
+    num_poses > 1 the first person fills pose_landmarks and everyone is in `people`.
+    """
+
+    def __init__(self, model_path=POSE_TASK_MODEL, pipelined=True, result_timeout=1.0, num_poses=1,
+                 min_detection_confidence=0.5, min_tracking_confidence=0.5):
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(
+                f"Pose landmarker model not found: {model_path}. Download pose_landmarker_full.task from "
+                "https://developers.google.com/mediapipe/solutions/vision/pose_landmarker and save it there, "
+                "or point AITHLETIQUE_POSE_TASK_MODEL at it."
+            )
+        self.mp_pose = mp.solutions.pose
+        self.mp_drawing = mp.solutions.drawing_utils
+        self.model_path = model_path
+        self.pipelined = pipelined
+        self.result_timeout = result_timeout
+        self.num_poses = num_poses
+        self.min_detection_confidence = min_detection_confidence
+        self.min_tracking_confidence = min_tracking_confidence
+        self.frame_budget = None
+
+        self._condition = threading.Condition()
+        self._latest = PoseResults()
+        self._latest_timestamp = -1
+        self._last_submitted = -1
+        self._rgb = None
+        self.landmarker = self._create_landmarker()
+
+    def _create_landmarker(self):
+        options = vision.PoseLandmarkerOptions(
+            base_options=mp_tasks.BaseOptions(model_asset_path=self.model_path),
+            running_mode=vision.RunningMode.LIVE_STREAM,
+            num_poses=self.num_poses,
+            min_pose_detection_confidence=self.min_detection_confidence,
+            min_tracking_confidence=self.min_tracking_confidence,
+            result_callback=self._on_result
+        )
+        return vision.PoseLandmarker.create_from_options(options)
+
+    def _on_result(self, result, output_image, timestamp_ms):
+        # Runs on MediaPipe's thread
+        people = np.array(
+            [[(lm.x, lm.y, lm.z, lm.visibility) for lm in pose] for pose in result.pose_landmarks],
+            dtype=np.float32
+        ).reshape(-1, NUM_LANDMARKS, 4)
+        results = landmarks_to_results(people[0] if len(people) else None)
+        results.people = people
+        with self._condition:
+            if timestamp_ms > self._latest_timestamp:
+                self._latest = results
+                self._latest_timestamp = timestamp_ms
+            self._condition.notify_all()
+
+    def submit(self, frame, rgb=None):
+        """
+        Queues a BGR frame for inference and returns its timestamp in ms.
+        """
+        if rgb is None:
+            if self._rgb is None or self._rgb.shape != frame.shape:
+                self._rgb = np.empty_like(frame)
+            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self._rgb)
+        # LIVE_STREAM requires strictly increasing timestamps
+        timestamp_ms = max(int(time.monotonic() * 1000), self._last_submitted + 1)
+        self._last_submitted = timestamp_ms
+        # mp.Image copies the pixels, so the buffer can be reused right away
+        image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb)
+        self.landmarker.detect_async(image, timestamp_ms)
+        return timestamp_ms
+
+    def detect_pose(self, frame, rgb=None):
+        timestamp_ms = self.submit(frame, rgb)
+        with self._condition:
+            if not self.pipelined:
+                # The landmarker may drop frames while busy, so do not wait forever
+                self._condition.wait_for(lambda: self._latest_timestamp >= timestamp_ms, timeout=self.result_timeout)
+            return self._latest
+
+    def reset(self):
+        # LIVE_STREAM graphs keep tracking state with no way to clear it
+        self.landmarker.close()
+        with self._condition:
+            self._latest = PoseResults()
+            self._latest_timestamp = -1
+        self.landmarker = self._create_landmarker()
+
+    def close(self):
+        self.landmarker.close()
@@ -3,10 +3,11 @@ import streamlit as st
 import numpy as np
 import threading
 from backend.feedback_engine.pose_comparator import (
-    generate_directional_feedback,
-    generate_advanced_feedback,
+    rank_feedback,
     check_enough_landmarks
 )
+from backend.feedback_engine.pose_normalization import normalize_pose
+from backend.feedback_engine.frame_features import FrameFeatures, as_features
 
 JOINT_NAMES = {
      11: 'right shoulder', 12: 'left shoulder', 13: 'right elbow', 14: 'left elbow',
@@ -15,6 +16,9 @@ JOINT_NAMES = {
 }
 
 POSE_DELAY = 3
+# Thresholds in torso lengths of the canonical pose
+FEEDBACK_THRESHOLD = 0.06
+OVERLAY_THRESHOLD = 0.08
 
 speak_lock = threading.Lock()
 
@@ -36,27 +40,36 @@ def should_give_feedback(key, delay=3):
         return True
     return False
 
-def draw_feedback_overlay(landmarks, ref_landmarks, joint_names, threshold=0.02):
+def draw_feedback_overlay(landmarks, ref_landmarks, joint_names, threshold=OVERLAY_THRESHOLD, positions=None):
+    """
+    Marks the joints whose canonical positions differ from the reference;
+    the markers are drawn at `positions` (the raw image landmarks).
+    """
     import cv2
-    wrong_joints = []
-    for i, (user, ref) in enumerate(zip(landmarks, ref_landmarks)):
-        if i in joint_names:
-            ux, uy = user[:2]
-            rx, ry = ref[:2]
-            if abs(ux - rx) > threshold or abs(uy - ry) > threshold:
-                wrong_joints.append((int(ux * 640), int(uy * 480)))
+    joints = np.array(sorted(joint_names))
+    user = np.asarray(landmarks)[joints, :2]
+    ref = np.asarray(ref_landmarks)[joints, :2]
+    wrong = (np.abs(user - ref) > threshold).any(axis=1)
+    points = np.asarray(positions if positions is not None else landmarks)[joints, :2]
     overlay = np.zeros((480, 640, 3), dtype=np.uint8)
-    for x, y in wrong_joints:
-        cv2.circle(overlay, (x, y), 8, (0, 0, 255), -1)
+    for x, y in (points[wrong] * (640, 480)).astype(int):
+        cv2.circle(overlay, (int(x), int(y)), 8, (0, 0, 255), -1)
     return overlay
 
-def vrikshasana_coach(landmarks, reference, coach):
+def vrikshasana_coach(landmarks, reference, coach, reference_canonical=None):
+    """
+    landmarks may be the raw pose or the frame's FrameFeatures.
+    """
+    features = as_features(landmarks)
+    landmarks = features.landmarks
     if "pose_stage" not in st.session_state:
         st.session_state.pose_stage = 0
     if "last_feedback_time" not in st.session_state:
         st.session_state.last_feedback_time = 0
     if "last_feedback_text" not in st.session_state:
         st.session_state.last_feedback_text = ""
+    if "last_feedback_key" not in st.session_state:
+        st.session_state.last_feedback_key = None
     if "start_delay" not in st.session_state:
         st.session_state.start_delay = time.time()
     if "feedback_timers" not in st.session_state:
@@ -67,7 +80,7 @@ def vrikshasana_coach(landmarks, reference, coach):
     if now - st.session_state.start_delay < 2:
         return
 
-    if not check_enough_landmarks(landmarks):
+    if not check_enough_landmarks(features):
         return
 
     left_foot = landmarks[28][1]
@@ -92,12 +105,14 @@ def vrikshasana_coach(landmarks, reference, coach):
         if should_give_feedback("foot", delay=POSE_DELAY):
             async_speak(coach, "Raise your left foot and place it on your right thigh.")
             st.session_state.last_feedback_text = "Raise your left foot and place it on your right thigh."
+            st.session_state.last_feedback_key = "foot"
             feedback_given = True
 
     if not hands_joined:
         if should_give_feedback("hands", delay=POSE_DELAY):
             async_speak(coach, "Join your hands in front of your chest.")
             st.session_state.last_feedback_text = "Join your hands in front of your chest."
+            st.session_state.last_feedback_key = "hands"
             feedback_given = True
 
     if feedback_given:
@@ -109,28 +124,33 @@ def vrikshasana_coach(landmarks, reference, coach):
             st.session_state.last_feedback_text = ""
 
     if st.session_state.pose_stage == 2:
-        if not check_enough_landmarks(landmarks):
+        if not check_enough_landmarks(features):
             return
 
-        if hasattr(reference, "shape") and reference.ndim == 3:
-            ref_pose = reference[0]
+        if reference_canonical is None:
+            reference_canonical = normalize_pose(reference)
+        if reference_canonical.ndim == 3:
+            ref_pose = reference_canonical[0]
         else:
-            ref_pose = reference
+            ref_pose = reference_canonical
 
-        simple_feedbacks = generate_directional_feedback(landmarks, ref_pose, JOINT_NAMES, threshold=0.015)
-        advanced_feedbacks = generate_advanced_feedback(landmarks, ref_pose, JOINT_NAMES, angle_threshold=10)
-        combined_feedbacks = simple_feedbacks + advanced_feedbacks
+        # Normalizing leaves the 3D joint angles unchanged
+        live = FrameFeatures(features.canonical, important_angles=features.important_angles)
+        cues = rank_feedback(live, ref_pose, JOINT_NAMES, threshold=FEEDBACK_THRESHOLD, angle_threshold=10)
 
-        st.session_state.overlay = draw_feedback_overlay(landmarks, ref_pose, JOINT_NAMES)
+        st.session_state.overlay = draw_feedback_overlay(features.canonical, ref_pose, JOINT_NAMES, positions=landmarks)
 
-        if combined_feedbacks:
-            current_feedback = combined_feedbacks[0]
-            feedback_changed = current_feedback != st.session_state.last_feedback_text
+        if cues:
+            cue = cues[0]
+            feedback_changed = cue.key != st.session_state.last_feedback_key
             if should_give_feedback("pose_correction", delay=POSE_DELAY) or feedback_changed:
+                current_feedback = cue.render()
                 async_speak(coach, current_feedback)
                 st.session_state.last_feedback_text = current_feedback
+                st.session_state.last_feedback_key = cue.key
         else:
             st.session_state.last_feedback_text = ""
+            st.session_state.last_feedback_key = None
 
     if not foot_placed or not hands_joined:
         st.session_state.pose_stage = 1
@@ -2,25 +2,43 @@ import cv2
 import tempfile
 import streamlit as st
 import time
-import numpy as np
 import os
 
-from backend.pose_detection.mediapipe_model import PoseDetector
+from backend.pose_detection.detector_pool import acquire_pose_detector, release_pose_detector
+from backend.pose_detection.frame_source import open_frame_source
+from backend.pose_detection.capture_profile import CaptureProfile
+from backend.pose_detection.frame_scheduler import FrameScheduler
+from backend.pose_detection.motion_gate import MotionGate
+from backend.pose_detection.landmark_filter import OneEuroFilter, track_landmarks
 from backend.feedback_engine.vrikshasana_coach import vrikshasana_coach
 
 
 from backend.feedback_engine.pose_comparator import (
     load_single_reference_landmarks,
-    compute_pose_accuracy,
+    ReferenceAngleIndex,
     check_enough_landmarks,
-    generate_directional_feedback,
-    generate_advanced_feedback
+    rank_feedback
+)
+from backend.feedback_engine.reference_library import load_reference_library
+from backend.feedback_engine.pose_normalization import PoseNormalizer, normalize_pose
+from backend.feedback_engine.frame_features import FrameFeatures
+from backend.feedback_engine.motion_tools import (
+    load_motion_reference,
+    load_compact_motion_reference,
+    motion_depth,
+    CompactMotionReference,
+    StreamingDTW
 )
-from backend.feedback_engine.motion_tools import load_motion_reference, compute_motion_similarity
 from backend.voice.tts_engine import VoiceCoach
 from database.logger import init_db, log_session
 
-def run_pose_detection(pose_name="tadasana", category="Yoga & Meditation"):
+# Yoga pose name that makes the session recognize the asana from the whole reference library
+AUTO_DETECT = "auto detect"
+
+# Directional cue threshold in torso lengths (~0.015 image units at a typical distance)
+FEEDBACK_THRESHOLD = 0.06
+
+def run_pose_detection(pose_name="tadasana", category="Yoga & Meditation", source=0, realtime=True):
     init_db()
 
     if "running" not in st.session_state:
@@ -36,13 +54,20 @@ def run_pose_detection(pose_name="tadasana", category="Yoga & Meditation"):
     if "pose_held" not in st.session_state:
         st.session_state.pose_held = False
 
-    detector = PoseDetector()
     coach = VoiceCoach()
 
     reference_landmarks = None
+    reference_library = None
     motion_reference = None
 
-    if category == "Yoga & Meditation":
+    if category == "Yoga & Meditation" and pose_name == AUTO_DETECT:
+        try:
+            reference_library = load_reference_library()
+            reference_landmarks = reference_library.landmarks
+        except Exception as e:
+            st.error("❌ Could not load the reference library.")
+            return
+    elif category == "Yoga & Meditation":
         try:
             corrected_pose_name = pose_name.capitalize()
             reference_landmarks = load_single_reference_landmarks(f"pose_references/{corrected_pose_name}.npz")
@@ -50,11 +75,17 @@ def run_pose_detection(pose_name="tadasana", category="Yoga & Meditation"):
             st.error(f"❌ Could not load reference for {pose_name}.")
             return
     elif category == "Workout & Training":
-        motion_reference = load_motion_reference(f"motion_references/{pose_name}_motion.npz")
+        motion_path = f"motion_references/{pose_name}_motion.npz"
+        # The angle-space form is a fraction of the size and cheaper to match; raw landmarks are the fallback
+        motion_reference = load_compact_motion_reference(motion_path)
+        if motion_reference is None:
+            motion_reference = load_motion_reference(motion_path)
         if motion_reference is None:
             st.error(f"❌ No motion reference found for {pose_name}.")
             return
 
+    detector = acquire_pose_detector()
+
     st.session_state.running = True
     st.session_state.start_time = time.time()
     st.session_state.feedback_collected = set()
@@ -68,129 +99,192 @@ def run_pose_detection(pose_name="tadasana", category="Yoga & Meditation"):
     if stop_button_placeholder.button("🔚 Stop Session", key=f"stop_button_once_{pose_name}"):
         st.session_state.stop = True
 
-    process_camera(pose_name, detector, coach, reference_landmarks, motion_reference, stop_button_placeholder)
+    process_camera(pose_name, detector, coach, reference_landmarks, motion_reference, stop_button_placeholder, source, realtime, reference_library)
 
-def process_camera(pose_name, detector, coach, reference_landmarks, motion_reference, stop_button_placeholder):
-    camera = cv2.VideoCapture(0)
+def process_camera(pose_name, detector, coach, reference_landmarks, motion_reference, stop_button_placeholder, source=0, realtime=True, reference_library=None):
+    camera = open_frame_source(source, profile=CaptureProfile.for_pose_detector(), realtime=realtime)
     temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.jpg')
     stframe = st.empty()
     feedback_placeholder = st.empty()
     accuracy_display = st.empty()
     reps_display = st.empty()
+    detected_display = st.empty()
 
     last_accuracy = 0
-    motion_buffer = []
-
-    while camera.isOpened():
-        if st.session_state.stop:
-            break
-
-        ret, frame = camera.read()
-        if not ret:
-            st.error("❌ Camera error.")
-            break
-
-        frame = cv2.flip(frame, 1)
-        results = detector.detect_pose(frame)
-        frame = detector.draw_landmarks(frame, results)
-        landmarks = detector.get_landmarks(results)
-
-        if landmarks:
-            if not check_enough_landmarks(landmarks):
-                feedback_placeholder.warning("⚠️ Full body not detected. Please adjust your position!")
-                accuracy_display.metric("🎯 Accuracy", "0%")
-            else:
-                if reference_landmarks is not None:
-                    accuracy = compute_pose_accuracy(landmarks, reference_landmarks)
-                    last_accuracy = (0.7 * last_accuracy) + (0.3 * accuracy)
-                    accuracy_display.metric("🎯 Accuracy", f"{last_accuracy:.2f}%")
-
-                    if last_accuracy >= 90:
-                        feedback_placeholder.success("✅ Excellent posture!")
-                    elif last_accuracy >= 75:
-                        feedback_placeholder.warning("⚠️ Minor Adjustments Needed!")
-                    else:
-                        feedback_placeholder.error("❌ Major correction needed.")
-
-                    if "last_voice_feedback_time" not in st.session_state:
-                        st.session_state.last_voice_feedback_time = 0
-                    if "last_feedback_text" not in st.session_state:
-                        st.session_state.last_feedback_text = ""
-
-                    now = time.time()
-                    feedback_delay = 3
-
-                    if hasattr(reference_landmarks, "shape") and reference_landmarks.ndim == 3:
-                        ref = reference_landmarks[np.random.randint(len(reference_landmarks))]
-                    else:
-                        ref = reference_landmarks
-
-                    JOINT_NAMES = {
-                        0: 'nose', 11: 'right shoulder', 12: 'left shoulder', 13: 'right elbow', 14: 'left elbow',
-                        15: 'right wrist', 16: 'left wrist', 23: 'right hip', 24: 'left hip',
-                        25: 'right knee', 26: 'left knee', 27: 'right ankle', 28: 'left ankle'
-                    }
-
-                    # Specific logic for vrikshasana startup check
-                    if pose_name.lower() == "vrikshasana":
-                        
-                        vrikshasana_coach(landmarks, reference_landmarks, coach)
-
-                    else:
-                        simple_feedbacks = generate_directional_feedback(landmarks, ref, JOINT_NAMES, threshold=0.015)
-                        advanced_feedbacks = generate_advanced_feedback(landmarks, ref, JOINT_NAMES, angle_threshold=10)
-                        combined_feedbacks = simple_feedbacks + advanced_feedbacks
-
-                        if combined_feedbacks:
-                            current_feedback = combined_feedbacks[0]
-                            feedback_changed = current_feedback != st.session_state.last_feedback_text
-                            enough_time_passed = (now - st.session_state.last_voice_feedback_time) > feedback_delay
-
-                            if feedback_changed or enough_time_passed:
-                                coach.speak(current_feedback)
-                                st.session_state.last_feedback_text = current_feedback
-                                st.session_state.last_voice_feedback_time = now
+    if motion_reference is not None:
+        motion_matcher = StreamingDTW(motion_reference)
+        # 0 at the top of the movement and 1 at the bottom, per reference frame
+        if isinstance(motion_reference, CompactMotionReference):
+            reference_depth = motion_reference.depth
+        else:
+            reference_depth = motion_depth(motion_reference)
+    # Reference angles never change during a session; the library is already indexed
+    if reference_library is not None:
+        reference_index = reference_library
+    else:
+        reference_index = ReferenceAngleIndex(reference_landmarks) if reference_landmarks is not None else None
+    # Feedback compares canonical poses; the references are normalized once
+    reference_canonical = normalize_pose(reference_landmarks) if reference_landmarks is not None else None
+    normalizer = PoseNormalizer()
+    # FrameFeatures of the references used for feedback, built on first use
+    reference_features = {}
+    active_pose = pose_name
+    detected_counts = {}
+    active_fps = 15 if camera.realtime else None
+    scheduler = FrameScheduler(target_fps=active_fps)
+    detector.set_frame_budget(scheduler.budget)
+    landmark_filter = OneEuroFilter()
+    gate = MotionGate(refresh_interval=0.5)
+
+    try:
+        while camera.isOpened():
+            if st.session_state.stop:
+                break
+
+            scheduler.begin_frame()
+
+            ret, frame, captured_at, dropped = camera.read()
+            if not ret:
+                st.error("❌ Camera error.")
+                break
+
+            frame = cv2.flip(frame, 1)
+            # The gate only takes this frame as its reference if the scheduler lets detection run too
+            detect = gate.should_analyze(frame, captured_at, commit=False) and scheduler.should_run("pose_detection")
+            results, landmarks = track_landmarks(detector, landmark_filter, frame, captured_at, detect=detect)
+            if detect:
+                gate.mark_analyzed(captured_at)
+                gate.record(landmarks is not None, captured_at)
+                if active_fps:
+                    scheduler.set_target_fps(gate.idle_fps if gate.idle else active_fps)
+            frame = detector.draw_landmarks(frame, results)
+
+            if landmarks is not None:
+                # Every analyzer below reads this frame's angles, visibility and canonical pose from here
+                features = FrameFeatures(landmarks)
+                if not check_enough_landmarks(features):
+                    feedback_placeholder.warning("⚠️ Full body not detected. Please adjust your position!")
+                    accuracy_display.metric("🎯 Accuracy", "0%")
+                else:
+                    if reference_landmarks is not None:
+                        accuracy, reference_id = reference_index.best_match(features)
+                        if reference_library is not None:
+                            active_pose, votes = reference_library.identify(features)
+                            detected_counts[active_pose] = detected_counts.get(active_pose, 0) + 1
+                            detected_display.markdown(f"🧘 Detected pose: **{active_pose.title()}** ({votes:.0%} of nearest references)")
+                        last_accuracy = (0.7 * last_accuracy) + (0.3 * accuracy)
+                        accuracy_display.metric("🎯 Accuracy", f"{last_accuracy:.2f}%")
+
+                        if last_accuracy >= 90:
+                            feedback_placeholder.success("✅ Excellent posture!")
+                        elif last_accuracy >= 75:
+                            feedback_placeholder.warning("⚠️ Minor Adjustments Needed!")
                         else:
+                            feedback_placeholder.error("❌ Major correction needed.")
+
+                        if "last_voice_feedback_time" not in st.session_state:
+                            st.session_state.last_voice_feedback_time = 0
+                        if "last_feedback_text" not in st.session_state:
                             st.session_state.last_feedback_text = ""
+                        if "last_feedback_key" not in st.session_state:
+                            st.session_state.last_feedback_key = None
 
-                elif motion_reference is not None:
-                    motion_buffer.append(landmarks)
-                    if len(motion_buffer) > 10:
-                        motion_buffer = motion_buffer[-10:]
-
-                    accuracy = compute_motion_similarity(motion_buffer, motion_reference)
-                    last_accuracy = (0.7 * last_accuracy) + (0.3 * accuracy)
-                    accuracy_display.metric("🎯 Accuracy", f"{last_accuracy:.2f}%")
-                    reps_display.metric("✅ Reps", st.session_state.reps)
-
-                    if accuracy > 80 and not st.session_state.pose_held:
-                        st.session_state.reps += 1
-                        st.session_state.pose_held = True
-                        coach.speak("✅ Great rep!")
-
-                    if accuracy < 40:
-                        st.session_state.pose_held = False
-
-                    if accuracy < 60:
-                        feedback_placeholder.markdown("### ⚠️ Adjust your form!")
-                        coach.speak("Adjust your form!")
-                    else:
-                        feedback_placeholder.markdown("### ✅ Looking good!")
-        else:
-            feedback_placeholder.warning("⚠️ No pose detected.")
+                        now = time.time()
+                        feedback_delay = 3
+
+                        if hasattr(reference_landmarks, "shape") and reference_landmarks.ndim == 3:
+                            # Correct towards the reference the user is closest to
+                            ref = reference_canonical[reference_id]
+                        else:
+                            reference_id = 0
+                            ref = reference_canonical
+
+                        JOINT_NAMES = {
+                            0: 'nose', 11: 'right shoulder', 12: 'left shoulder', 13: 'right elbow', 14: 'left elbow',
+                            15: 'right wrist', 16: 'left wrist', 23: 'right hip', 24: 'left hip',
+                            25: 'right knee', 26: 'left knee', 27: 'right ankle', 28: 'left ankle'
+                        }
+
+                        # Specific logic for vrikshasana startup check
+                        if active_pose.lower() == "vrikshasana":
+                            if reference_library is not None:
+                                in_pose = reference_library.labels == active_pose
+                                vrikshasana_coach(features, reference_landmarks[in_pose], coach,
+                                                  reference_canonical=reference_canonical[in_pose])
+                            else:
+                                vrikshasana_coach(features, reference_landmarks, coach,
+                                                  reference_canonical=reference_canonical)
+
+                        elif scheduler.should_run("voice_feedback"):
+                            if reference_id not in reference_features:
+                                reference_features[reference_id] = FrameFeatures(ref)
+                            # Normalizing and aligning leave the 3D joint angles unchanged
+                            normalizer.update(landmarks, captured_at)
+                            live = FrameFeatures(normalizer.aligned_to(reference_id, ref),
+                                                 important_angles=features.important_angles)
+                            cues = rank_feedback(live, reference_features[reference_id], JOINT_NAMES,
+                                                 threshold=FEEDBACK_THRESHOLD, angle_threshold=10)
+
+                            if cues:
+                                cue = cues[0]
+                                feedback_changed = cue.key != st.session_state.last_feedback_key
+                                enough_time_passed = (now - st.session_state.last_voice_feedback_time) > feedback_delay
+
+                                if feedback_changed or enough_time_passed:
+                                    current_feedback = cue.render()
+                                    coach.speak(current_feedback)
+                                    st.session_state.last_feedback_text = current_feedback
+                                    st.session_state.last_feedback_key = cue.key
+                                    st.session_state.last_voice_feedback_time = now
+                            else:
+                                st.session_state.last_feedback_text = ""
+                                st.session_state.last_feedback_key = None
+
+                    elif motion_reference is not None:
+                        accuracy = motion_matcher.update(landmarks)
+                        last_accuracy = (0.7 * last_accuracy) + (0.3 * accuracy)
+                        accuracy_display.metric("🎯 Accuracy", f"{last_accuracy:.2f}%")
+                        reps_display.metric("✅ Reps", st.session_state.reps)
+                        detected_display.caption(
+                            f"Movement phase: {motion_matcher.progress:.0%} of the reference "
+                            f"(alignment cost {motion_matcher.cost:.2f})"
+                        )
+
+                        # A rep is the aligned reference reaching the bottom of the movement in good form
+                        depth = reference_depth[motion_matcher.phase] if motion_matcher.phase is not None else 0
+                        if accuracy > 80 and depth > 0.8 and not st.session_state.pose_held:
+                            st.session_state.reps += 1
+                            st.session_state.pose_held = True
+                            coach.speak("✅ Great rep!")
+
+                        if depth < 0.2:
+                            st.session_state.pose_held = False
+
+                        if accuracy < 60:
+                            feedback_placeholder.markdown("### ⚠️ Adjust your form!")
+                            coach.speak("Adjust your form!")
+                        else:
+                            feedback_placeholder.markdown("### ✅ Looking good!")
+            else:
+                feedback_placeholder.warning("⚠️ No pose detected.")
 
-        cv2.imwrite(temp_file.name, frame)
-        if "overlay" in st.session_state:
-            try:
-                frame=cv2.addweighted(frame, 1.0, st.session_state.overlay, 0.6, 0)
-            except Exception:
-                pass
-        stframe.image(temp_file.name, channels="BGR", use_container_width=True)
+            cv2.imwrite(temp_file.name, frame)
+            if "overlay" in st.session_state:
+                try:
+                    frame=cv2.addweighted(frame, 1.0, st.session_state.overlay, 0.6, 0)
+                except Exception:
+                    pass
+            stframe.image(temp_file.name, channels="BGR", use_container_width=True)
 
-        time.sleep(0.5)
+            scheduler.end_frame()
+    finally:
+        camera.release()
+        release_pose_detector(detector)
 
-    camera.release()
     duration = round(time.time() - st.session_state.start_time, 2)
+    if detected_counts:
+        # Log the asana the user spent the session in
+        pose_name = max(detected_counts, key=detected_counts.get)
 
     log_session(
         pose=pose_name,
@@ -208,7 +302,8 @@ def process_camera(pose_name, detector, coach, reference_landmarks, motion_refer
     feedback_placeholder.empty()
     accuracy_display.empty()
     reps_display.empty()
+    detected_display.empty()
     stop_button_placeholder.empty()
 
-    summary = f"✅ Session saved! Duration: {duration} sec | Reps: {st.session_state.reps} | Feedbacks: {len(fb)} types."
+    summary = f"✅ Session saved! Duration: {duration} sec | Reps: {st.session_state.reps} | Feedbacks: {len(fb)} types | {scheduler.achieved_fps:.1f} FPS."
     st.success(summary)
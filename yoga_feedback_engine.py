@@ -1,5 +1,7 @@
 
-import math
+import numpy as np
+
+from backend.feedback_engine.angles import joint_angles
 
 # Real reference values for Vriksasana (.npz-derived)
 vriksasana_reference = {
@@ -22,11 +24,9 @@ tadasana_reference = {
 
 
 def calculate_angle(a, b, c):
-    angle = math.degrees(
-        math.atan2(c["y"] - b["y"], c["x"] - b["x"]) -
-        math.atan2(a["y"] - b["y"], a["x"] - b["x"])
-    )
-    return abs(angle) if angle >= 0 else abs(angle + 360)
+    # Directed angle in [0, 360), as the reference back angles were measured
+    points = np.array([[p["x"], p["y"]] for p in (a, b, c)])
+    return joint_angles(points, (0, 1, 2), directed=True)[0]
 
 
 def get_feedback_tags(landmarks):
@@ -2,6 +2,7 @@ import cv2
 import numpy as np
 import os
 import mediapipe as mp
+from backend.pose_detection.frame_source import ImageFolderSource
 
 # Initialize MediaPipe pose
 mp_pose = mp.solutions.pose
@@ -35,16 +36,11 @@ def main():
 
     all_landmarks = []
 
-    image_files = [f for f in os.listdir(folder_path) if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
-    print(f"Found {len(image_files)} images.")
+    source = ImageFolderSource(folder_path)
+    print(f"Found {len(source)} images.")
 
-    for img_name in image_files:
-        img_path = os.path.join(folder_path, img_name)
-        frame = cv2.imread(img_path)
-
-        if frame is None:
-            print(f"⚠️ Skipping unreadable image: {img_name}")
-            continue
+    for frame in source:
+        img_name = os.path.basename(source.current_path)
 
         rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
         results = pose.process(rgb_frame)
@@ -74,6 +70,9 @@ def main():
 
     cv2.destroyAllWindows()
 
+    for img_path in source.skipped:
+        print(f"⚠️ Skipped unreadable image: {os.path.basename(img_path)}")
+
     if len(all_landmarks) == 0:
         print("❌ No valid landmarks collected. Nothing saved.")
         return